@@ -0,0 +1,153 @@
+"""
+Offline command latency benchmark
+
+Drives the real prefix command handlers against fake guilds, voice clients and
+a fake yt-dlp backend, and reports p50/p99 latency per command together with
+how long the event loop was blocked.
+
+    python -m benchmarks.command_latency --guilds 1,10,100,1000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.fakes import FakeBot, FakeYTDLProcessor, build_fake_source, make_guild
+
+COMMANDS = ('play', 'queue', 'remove', 'skip', 'stop')
+
+class LoopMonitor:
+    """Measures event loop blocking by how late a short periodic sleep wakes up"""
+
+    def __init__(self, interval=0.001, threshold=0.005):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self.blocked = 0.0  # Total lag above the threshold
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - started - self.interval
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.blocked += lag
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def install_fakes(args):
+    """Swap the network and process facing parts of the music stack for fakes"""
+    import prefix_commands.play as play
+    from libs.music.library import AudioLibrary
+
+    play.ytdl_processor = FakeYTDLProcessor(delay=args.ytdl_delay)
+    play.build_audio_source = build_fake_source
+    play.audio_library = AudioLibrary(tempfile.mkdtemp(prefix="breadbot-bench-"))
+
+    # play.setup() creates the transcode cache folder, keep it out of the working directory
+    os.environ['TRANSCODE_CACHE_DIR'] = tempfile.mkdtemp(prefix="breadbot-bench-cache-")
+
+def setup_commands(bot):
+    """Register the real command handlers on the fake bot"""
+    from prefix_commands import play, queue, remove, skip, stop
+    for module in (play, queue, remove, skip, stop):
+        module.setup(bot)
+
+async def timed(latencies, name, coro):
+    """Await a command handler and record its latency"""
+    started = time.perf_counter()
+    await coro
+    latencies[name].append(time.perf_counter() - started)
+
+async def run_guild(bot, ctx, args, latencies):
+    """One guild's session: fill the queue, look at it, trim it, skip and stop"""
+    commands = bot.commands
+    for index in range(args.songs):
+        # Every other request repeats an earlier song to exercise the resolution cache
+        query = f"song {ctx.guild.id}-{index // 2 if index % 2 else index}"
+        await timed(latencies, 'play', commands['play'](ctx, query=query))
+
+    for _ in range(args.repeat):
+        await timed(latencies, 'queue', commands['queue'](ctx))
+    await timed(latencies, 'remove', commands['remove'](ctx, 1))
+    await timed(latencies, 'skip', commands['skip'](ctx))
+    # Let play_next pick up the skipped song
+    await asyncio.sleep(0)
+    await timed(latencies, 'stop', commands['stop'](ctx))
+
+async def run_scenario(guild_count, args):
+    """Run all guilds concurrently and collect latencies and loop blocking"""
+    from libs.music.core import players
+
+    loop = asyncio.get_running_loop()
+    bot = FakeBot(loop)
+    setup_commands(bot)
+    players.clear()
+
+    latencies = defaultdict(list)
+    contexts = [make_guild(guild_id, args.rest_latency) for guild_id in range(1, guild_count + 1)]
+
+    monitor = LoopMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(run_guild(bot, ctx, args, latencies) for ctx in contexts))
+    elapsed = time.perf_counter() - started
+    monitor.stop()
+
+    # Let callbacks and background tasks of stopped players wind down
+    await asyncio.sleep(0.05)
+    return latencies, monitor, elapsed
+
+def report(guild_count, latencies, monitor, elapsed):
+    print(f"\n{guild_count} guild(s) - {elapsed:.2f}s wall, loop max lag {monitor.max_lag * 1000:.1f} ms, "
+          f"blocked {monitor.blocked * 1000:.1f} ms")
+    print(f"  {'command':<10}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for name in COMMANDS:
+        samples = latencies.get(name)
+        if not samples:
+            continue
+        print(f"  {name:<10}{len(samples):>8}{percentile(samples, 50) * 1000:>10.2f}"
+              f"{percentile(samples, 99) * 1000:>10.2f}{statistics.mean(samples) * 1000:>10.2f}")
+
+async def main(args):
+    install_fakes(args)
+    for guild_count in args.guilds:
+        # The bot logs every transition, keep that out of the report unless asked for
+        log = sys.stdout if args.verbose else io.StringIO()
+        with contextlib.redirect_stdout(log):
+            latencies, monitor, elapsed = await run_scenario(guild_count, args)
+        report(guild_count, latencies, monitor, elapsed)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Offline BreadBot command latency benchmark")
+    parser.add_argument('--guilds', default="1,10,100,1000",
+                        type=lambda value: [int(count) for count in value.split(',')],
+                        help="comma separated guild counts to simulate")
+    parser.add_argument('--songs', type=int, default=20, help="-play requests per guild")
+    parser.add_argument('--repeat', type=int, default=5, help="-queue requests per guild")
+    parser.add_argument('--ytdl-delay', type=float, default=0.05, help="seconds the fake yt-dlp takes per query")
+    parser.add_argument('--rest-latency', type=float, default=0.0, help="seconds each fake REST call takes")
+    parser.add_argument('--verbose', action='store_true', help="show the bot's own log output")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args(sys.argv[1:])))
@@ -0,0 +1,195 @@
+"""Stand-ins for the Discord gateway, voice and yt-dlp used by the offline benchmarks"""
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import discord
+
+class FakeBot:
+    """Just enough of commands.Bot for the setup() functions to register their handlers"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.commands = {}
+        self.user = SimpleNamespace(id=0, name="BreadBot")
+        self.latency = 0.0
+
+    def command(self, name=None, **kwargs):
+        def decorator(func):
+            self.commands[name or func.__name__] = func
+            return func
+        return decorator
+
+class FakeMessage:
+    """Sent message whose edits cost a configurable REST round trip"""
+
+    def __init__(self, rest_latency, content=None, embed=None):
+        self.rest_latency = rest_latency
+        self.content = content
+        self.embed = embed
+        self.edits = 0
+
+    async def edit(self, **kwargs):
+        await asyncio.sleep(self.rest_latency)
+        self.edits += 1
+        self.content = kwargs.get('content', self.content)
+        self.embed = kwargs.get('embed', self.embed)
+
+class FakeAudioSource(discord.AudioSource):
+    """Silent source standing in for an ffmpeg process"""
+
+    def __init__(self, frames=50 * 180):
+        self.frames = frames
+
+    def read(self):
+        if self.frames <= 0:
+            return b''
+        self.frames -= 1
+        return b'\x00' * 3840
+
+    def cleanup(self):
+        self.frames = 0
+
+def build_fake_source(song, *args, **kwargs):
+    """Replacement for build_audio_source that doesn't spawn ffmpeg"""
+    return FakeAudioSource()
+
+class FakeVoiceClient:
+    """Voice client that accepts sources without sending anything"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.source = None
+        self._after = None
+        self._playing = False
+        self._paused = False
+
+    def is_connected(self):
+        return True
+
+    def is_playing(self):
+        return self._playing
+
+    def is_paused(self):
+        return self._paused
+
+    def play(self, source, *, after=None, **kwargs):
+        if self._playing or self._paused:
+            raise discord.ClientException('Already playing audio.')
+        self.source = source
+        self._after = after
+        self._playing = True
+
+    def pause(self):
+        self._playing = False
+        self._paused = True
+
+    def resume(self):
+        self._playing = True
+        self._paused = False
+
+    def stop(self):
+        if not (self._playing or self._paused):
+            return
+        self._playing = False
+        self._paused = False
+        after, self._after = self._after, None
+        if self.source is not None:
+            self.source.cleanup()
+        if after is not None:
+            # discord.py calls this from the audio thread, the callback hands off to the loop itself
+            after(None)
+
+    async def move_to(self, channel):
+        self.channel = channel
+
+    async def disconnect(self, *, force=False):
+        self.stop()
+
+class FakeContext:
+    """commands.Context stand-in bound to one guild and one member"""
+
+    def __init__(self, guild, author, voice_client, rest_latency):
+        self.guild = guild
+        self.author = author
+        self.voice_client = voice_client
+        self.rest_latency = rest_latency
+        self.channel = SimpleNamespace(id=guild.id, send=self.send)
+        self.sent = 0
+
+    async def send(self, content=None, *, embed=None, **kwargs):
+        await asyncio.sleep(self.rest_latency)
+        self.sent += 1
+        return FakeMessage(self.rest_latency, content, embed)
+
+def make_guild(guild_id, rest_latency):
+    """Build a guild with one member who sits in a voice channel the bot is already connected to"""
+    channel = SimpleNamespace(id=guild_id * 10, name=f"voice-{guild_id}", members=[])
+    guild = SimpleNamespace(id=guild_id, name=f"guild-{guild_id}")
+    author = SimpleNamespace(
+        id=guild_id * 100,
+        name=f"user-{guild_id}",
+        display_name=f"user-{guild_id}",
+        avatar=None,
+        display_avatar=SimpleNamespace(url="https://cdn.invalid/avatar.png"),
+        bot=False,
+        voice=SimpleNamespace(channel=channel)
+    )
+    channel.members.append(author)
+    guild.get_member = lambda member_id: author if member_id == author.id else None
+    voice_client = FakeVoiceClient(channel)
+    guild.voice_client = voice_client
+    return FakeContext(guild, author, voice_client, rest_latency)
+
+class FakeYTDLProcessor:
+    """YTDLProcessor stand-in that answers every query after a fixed delay"""
+
+    def __init__(self, delay=0.05, duration=180):
+        self.delay = delay
+        self.duration = duration
+        self.futures = {}
+        self.jobs = 0
+
+    def start(self):
+        pass
+
+    def cleanup_all(self):
+        pass
+
+    def _result(self, query):
+        video_id = uuid.uuid5(uuid.NAMESPACE_URL, query).hex[:11]
+        return {
+            'success': True,
+            'mode': 'stream',
+            'title': query,
+            'url': f"https://rr1.googlevideo.invalid/videoplayback?id={video_id}&expire={int(time.time()) + 6 * 3600}",
+            'duration': self.duration,
+            'thumbnail': None,
+            'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+            'acodec': 'opus'
+        }
+
+    def process_url(self, query_id, query, mode="stream"):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.futures[query_id] = future
+        self.jobs += 1
+        loop.call_later(self.delay, lambda: future.done() or future.set_result(self._result(query)))
+
+    def result_future(self, query_id):
+        return self.futures.pop(query_id, None)
+
+    def is_processing(self, query_id):
+        return query_id in self.futures
+
+    def cancel_process(self, query_id):
+        future = self.futures.pop(query_id, None)
+        if future is not None:
+            future.cancel()
+        return future is not None
+
+    async def resolve(self, query, mode="stream", timeout=60):
+        query_id = str(uuid.uuid4())
+        self.process_url(query_id, query, mode)
+        return await self.result_future(query_id)
@@ -0,0 +1,67 @@
+"""
+Memory benchmark for queued tracks and players
+
+Measures with tracemalloc how many bytes a queued stream, a queued local file
+and an idle MusicPlayer take, which is what a guild's queue costs the process.
+
+    python -m benchmarks.memory --tracks 10000
+"""
+import argparse
+import gc
+import tracemalloc
+
+from libs.music.core import MusicPlayer, Song, StreamSong
+from libs.music.track_queue import TrackQueue
+
+class FakeRequester:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.display_name = f"User {user_id}"
+        self.avatar = None
+
+def measure(build):
+    """Bytes still allocated after build() returns, with its result kept alive"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+def build_streams(count, requesters):
+    queue = TrackQueue()
+    for index in range(count):
+        queue.append(StreamSong.from_result({
+            'title': f"Song number {index % 500}",
+            'duration': 180 + index % 120,
+            'webpage_url': f"https://www.youtube.com/watch?v={index:011d}",
+            'thumbnail': f"https://i.ytimg.com/vi/{index:011d}/hqdefault.jpg"
+        }, requesters[index % len(requesters)]))
+    return queue
+
+def build_files(count, requesters):
+    queue = TrackQueue()
+    for index in range(count):
+        name = f"track{index % 500}.mp3"
+        queue.append(Song(name, f"audio/{name}", requesters[index % len(requesters)], duration=200))
+    return queue
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=10000, help="queued tracks to measure")
+    parser.add_argument('--players', type=int, default=1000, help="idle players to measure")
+    args = parser.parse_args()
+
+    requesters = [FakeRequester(user_id) for user_id in range(20)]
+
+    size, _ = measure(lambda: build_streams(args.tracks, requesters))
+    print(f"stream track:  {size / args.tracks:8.0f} bytes")
+    size, _ = measure(lambda: build_files(args.tracks, requesters))
+    print(f"local track:   {size / args.tracks:8.0f} bytes")
+    size, _ = measure(lambda: [MusicPlayer() for _ in range(args.players)])
+    print(f"idle player:   {size / args.players:8.0f} bytes")
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,28 @@
+import time
+from libs.startup import ImportTimer
+
+# Time the startup imports, reported once the bot is ready
+import_timer = ImportTimer()
+import_timer.install()
+
 import discord
 from discord.ext import commands
+import argparse
 import os
 from dotenv import load_dotenv
 
+# Load environment variables (before the command modules, which read their settings on import)
+load_dotenv()
+
 # Import command modules
-from prefix_commands import hello, join, pause, ping, play, queue, remove, skip, stop
+from prefix_commands import hello, join, move, pause, ping, play, queue, remove, seek, shuffle, skip, stop
 from slash_commands import hello_slash, help_slash, ping_slash
+from libs.music.core import players
+from libs.sharding import shard_settings, run_shards, report_shard_stats
+from libs.store import content_hash, get_store
+from libs.triggers import TriggerEngine, load_triggers
 
-# Load environment variables
-load_dotenv()
+import_timer.uninstall()
 
 # Bot setup with intents
 intents = discord.Intents.default()
@@ -18,7 +32,26 @@ intents.voice_states = True
 intents.guilds = True
 
 # Create bot instance with modified prefix
-bot = commands.Bot(command_prefix='-', intents=intents)
+# (shard processes started with --shards only connect the shards in SHARD_IDS)
+SHARD_COUNT, SHARD_IDS = shard_settings()
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(command_prefix='-', intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+else:
+    bot = commands.Bot(command_prefix='-', intents=intents)
+
+# Publishes this process's stats to the shared store
+stats_task = None
+
+# Whether the startup report was printed already
+startup_reported = False
+
+# Auto-responses to trigger words like "bread"
+triggers = TriggerEngine(
+    load_triggers(),
+    prefix=bot.command_prefix,
+    cooldown=float(os.getenv('TRIGGER_COOLDOWN', '15')),
+    responses_per_second=float(os.getenv('TRIGGER_RESPONSES_PER_SECOND', '5'))
+)
 
 def create_help_embed():
     """Create the help message embed"""
@@ -48,6 +81,10 @@ def create_help_embed():
         "`-stop` - Stop playing, clear queue, and disconnect\n"
         "`-queue` - Show the current music queue\n"
         "`-remove <position>` or `-r <position>` - Remove a song from queue by position number\n`-rl` - Remove the last song in queue\n"
+        "`-removerange <first> <last>` - Remove every song between two positions\n"
+        "`-move <from> <to>` - Move a song to another position in the queue\n"
+        "`-seek <time>` - Jump to a position in the current song, e.g. `-seek 1:30`\n"
+        "`-shuffle` - Shuffle the queue\n"
     )
     embed.add_field(
         name="🎵 Music Commands",
@@ -70,6 +107,7 @@ def create_help_embed():
     music_features = (
         "• Play music from YouTube or local audio files\n"
         "• Queue system for multiple songs\n"
+        "• Queue whole YouTube playlists\n"
         "• Progress bar with current song position\n"
         "• Supports streaming and local playback\n"
         "• Supports .mp3, .wav, .ogg, and .m4a files\n"
@@ -115,21 +153,42 @@ async def update_help_message():
         channel = bot.get_channel(help_channel_id)
         
         if not channel:
-            print(f"Could not find channel with ID {help_channel_id}")
+            if not SHARD_COUNT:
+                print(f"Could not find channel with ID {help_channel_id}")
+            # When sharded, the process whose shards include the channel's server handles it
             return
         
         # Create the help embed
         help_embed = create_help_embed()
-        
-        # Check for existing pinned messages
-        pinned_messages = await channel.pins()
+
+        # Hash the content without the footer, whose timestamp changes every time
+        help_content = help_embed.to_dict()
+        help_content.pop('footer', None)
+        help_hash = content_hash(help_content)
+
+        # The help message we posted last time, remembered in the store shared by all processes
+        store = get_store()
+        saved = store.get('help', str(help_channel_id))
+        if saved and saved.get('hash') == help_hash:
+            # Already up to date, no need to fetch or edit anything
+            return
+
         help_message = None
+        if saved:
+            try:
+                help_message = await channel.fetch_message(saved['message'])
+            except discord.NotFound:
+                help_message = None
         
-        # Look for a pinned message from the bot that has "BreadBot Help" in the title
-        for msg in pinned_messages:
-            if msg.author == bot.user and msg.embeds and len(msg.embeds) > 0 and "BreadBot Help" in msg.embeds[0].title:
-                help_message = msg
-                break
+        if help_message is None:
+            # Check for existing pinned messages
+            pinned_messages = await channel.pins()
+            
+            # Look for a pinned message from the bot that has "BreadBot Help" in the title
+            for msg in pinned_messages:
+                if msg.author == bot.user and msg.embeds and len(msg.embeds) > 0 and "BreadBot Help" in msg.embeds[0].title:
+                    help_message = msg
+                    break
         
         if help_message:
             # Update existing message
@@ -137,24 +196,67 @@ async def update_help_message():
             print(f"Updated pinned help message in #{channel.name}")
         else:
             # Create new message
-            new_message = await channel.send(embed=help_embed)
+            help_message = await channel.send(embed=help_embed)
             # Pin the message
-            await new_message.pin()
+            await help_message.pin()
             print(f"Created and pinned new help message in #{channel.name}")
             
             # Send additional instructions for the first time
             await channel.send("📌 The help message has been pinned above! It will automatically update when new features are added.")
+
+        store.put('help', str(help_channel_id), {'message': help_message.id, 'hash': help_hash})
     
     except Exception as e:
         print(f"Error updating help message: {e}")
 
+async def sync_command_tree():
+    """Sync the slash commands with Discord, only if they changed since the last sync"""
+    commands_data = sorted(
+        (command.to_dict(bot.tree) for command in bot.tree.get_commands()),
+        key=lambda command: (command.get('type', 1), command['name'])
+    )
+    tree_hash = content_hash({'application': bot.application_id, 'commands': commands_data})
+
+    store = get_store()
+    if store.get('sync', 'tree') == tree_hash:
+        print("Slash commands unchanged, skipping sync")
+        return
+
+    synced = await bot.tree.sync()
+    store.put('sync', 'tree', tree_hash)
+    print(f"Synced {len(synced)} command(s)")
+
 @bot.event
 async def on_ready():
     """Event triggered when the bot is ready and connected to Discord"""
     print(f'{bot.user} has connected to Discord!')
+
+    global stats_task, startup_reported
+
+    if not startup_reported:
+        # Only after the first connect, reconnects aren't startups
+        startup_reported = True
+        import_timer.report(
+            ready_at=time.perf_counter(),
+            budget=float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '1000')) / 1000
+        )
+
+    # Bring back the queues from before the restart (only the first time we get ready)
+    await play.restore_players(bot)
+
+    # Drop players nobody has used in a while
+    play.start_player_eviction(bot)
+
+    # Leave voice channels nobody is listening in
+    play.voice_idle_manager.start(bot)
+
+    if stats_task is None:
+        stats_task = bot.loop.create_task(report_shard_stats(bot, get_store(), players))
+
     try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} command(s)")
+        # Slash commands are global, only one process has to sync them
+        if not SHARD_IDS or 0 in SHARD_IDS:
+            await sync_command_tree()
         
         # Update the help message
         await update_help_message()
@@ -166,11 +268,14 @@ def setup_commands(bot):
     """Setup all command modules"""
     hello.setup(bot)
     join.setup(bot)
+    move.setup(bot)
     pause.setup(bot)
     ping.setup(bot)
     play.setup(bot)
     queue.setup(bot)
     remove.setup(bot)
+    seek.setup(bot)
+    shuffle.setup(bot)
     skip.setup(bot)
     stop.setup(bot)
 
@@ -185,18 +290,31 @@ async def on_message(message):
     if message.author == bot.user:
         return
 
-    # Process commands
-    await bot.process_commands(message)
+    # Only messages starting with the prefix can be commands
+    if message.content.startswith(bot.command_prefix):
+        await bot.process_commands(message)
+        return
 
-    # Custom message responses
-    if 'bread' in message.content.lower():
-        await message.channel.send('Did someone say bread? 🍞')
+    # Custom message responses (throttled per channel)
+    response = triggers.respond(message)
+    if response:
+        await message.channel.send(response)
 
 # Run the bot
 def main():
+    parser = argparse.ArgumentParser(description="Run BreadBot")
+    parser.add_argument('--shards', type=int, help="run sharded, with this many shards in total")
+    parser.add_argument('--processes', type=int, help="processes to spread the shards over (default: one per core)")
+    args = parser.parse_args()
+
     token = os.getenv('DISCORD_TOKEN')
     if not token:
         raise ValueError("No token found! Make sure to set DISCORD_TOKEN in your .env file")
+
+    if args.shards:
+        # Launcher: start the shard processes (each runs this file again) and watch over them
+        run_shards(os.path.abspath(__file__), args.shards, args.processes)
+        return
     
     # Setup all commands
     setup_commands(bot)
@@ -0,0 +1,202 @@
+import discord
+import json
+import os
+import subprocess
+import time
+
+# Frames (20 ms each) read ahead when a source is pre-opened
+PREBUFFER_FRAMES = 50
+
+# "opus" sends Opus packets straight to Discord, "pcm" decodes and lets discord.py re-encode
+AUDIO_MODE = os.getenv('AUDIO_MODE', 'opus').lower()
+
+# Playback volume applied by ffmpeg (1.0 lets Opus streams pass through untouched)
+AUDIO_VOLUME = float(os.getenv('AUDIO_VOLUME', '1.0'))
+
+# Bitrate (kbps) when ffmpeg has to encode Opus itself
+OPUS_BITRATE = 128
+
+# ffmpeg input options that make it reconnect when a stream drops instead of ending the song early
+STREAM_RECONNECT_OPTIONS = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
+
+# Local file containers that may hold Opus audio and are worth probing
+OPUS_CONTAINERS = ('.opus', '.ogg', '.webm', '.mka')
+
+def probe_codec(path):
+    """Get the codec of the first audio stream of a local file with ffprobe (blocking)"""
+    try:
+        output = subprocess.check_output(
+            ['ffprobe', '-v', 'quiet', '-print_format', 'json',
+             '-show_streams', '-select_streams', 'a:0', path],
+            timeout=10
+        )
+        streams = json.loads(output).get('streams') or [{}]
+        return streams[0].get('codec_name')
+    except Exception as e:
+        print(f"Error probing {path}: {e}")
+        return None
+
+def song_codec(song):
+    """Get the audio codec of a song, probing local files only when they could be Opus"""
+    if hasattr(song, 'stream_url'):
+        # yt-dlp already told us
+        return song.codec
+    if os.path.splitext(song.full_path)[1].lower() not in OPUS_CONTAINERS:
+        return None
+    return probe_codec(song.full_path)
+
+def build_audio_source(song, volume=AUDIO_VOLUME, cached_path=None, start=0):
+    """
+    Create the FFmpeg audio source for a song (blocking, may spawn ffprobe and ffmpeg)
+
+    In opus mode Opus sources are only remuxed, everything else is encoded to
+    Opus by ffmpeg, so discord.py never has to decode or encode audio itself.
+
+    Args:
+        song: Song (local file) or StreamSong, its loudness gain is applied along with the volume
+        volume: Volume multiplier, applied as an ffmpeg filter
+        cached_path: Local Opus copy of a stream to play instead of the stream
+        start: Position in seconds to start at (ffmpeg seeks the input, so it's quick)
+
+    Returns:
+        discord.AudioSource ready to be played
+    """
+    # Check if it's a cached copy, a streaming source or a local file
+    codec = None
+    if cached_path:
+        location = cached_path
+        codec = 'opus'
+    elif hasattr(song, 'stream_url'):
+        location = song.stream_url
+    else:
+        location = song.full_path
+
+    # One static gain per song, anything else here would be paid for on every frame
+    volume_filters = []
+    if volume != 1.0:
+        volume_filters.append(f"volume={volume}")
+    if song.gain:
+        volume_filters.append(f"volume={song.gain:.1f}dB")
+    filters = f"-af {','.join(volume_filters)}" if volume_filters else None
+
+    # Input options: seek before opening the input, and reconnect dropped streams
+    input_options = []
+    if start > 0:
+        input_options.append(f"-ss {start:.2f}")
+    if location.startswith(('http://', 'https://')):
+        input_options.append(STREAM_RECONNECT_OPTIONS)
+    before_options = " ".join(input_options) or None
+
+    if AUDIO_MODE == 'pcm':
+        return discord.FFmpegPCMAudio(location, before_options=before_options, options=filters)
+
+    if filters is None and (codec or song_codec(song)) == 'opus':
+        # Passthrough - ffmpeg copies the Opus packets into the Ogg stream Discord reads
+        return discord.FFmpegOpusAudio(location, codec='copy', before_options=before_options)
+
+    return discord.FFmpegOpusAudio(location, bitrate=OPUS_BITRATE, before_options=before_options, options=filters)
+
+class PrebufferedSource(discord.AudioSource):
+    """Audio source that has already read its first frames, so playback can start instantly"""
+
+    def __init__(self, source):
+        self.source = source
+        self.buffer = []
+        self.position = 0
+
+    def prebuffer(self, frames=PREBUFFER_FRAMES):
+        """
+        Read the first frames ahead of time (blocking, run it in an executor)
+
+        Returns:
+            Number of frames buffered
+        """
+        while len(self.buffer) < frames:
+            data = self.source.read()
+            if not data:
+                break
+            self.buffer.append(data)
+        return len(self.buffer)
+
+    def read(self):
+        if self.position < len(self.buffer):
+            data = self.buffer[self.position]
+            self.buffer[self.position] = None  # Let buffered frames go as soon as they're played
+            self.position += 1
+            return data
+        return self.source.read()
+
+    def is_opus(self):
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self.buffer = []
+        self.source.cleanup()
+
+class FrameCountingSource(discord.AudioSource):
+    """
+    Audio source that counts the 20 ms frames actually handed to the voice client
+
+    discord.py reads one frame per 20 ms of audio it sends and stops reading
+    while paused, so the frame count is the exact playback position no
+    matter how ffmpeg stalls, buffers or reconnects. Reads that took longer
+    than a frame are counted too, they are the stalls listeners hear.
+    """
+
+    def __init__(self, source, offset=0.0):
+        """
+        Wrap a source
+
+        Args:
+            source: The audio source to play
+            offset: Position in seconds the source starts at
+        """
+        self.source = source
+        self.offset = offset
+        self.frames = 0
+        self.slow_reads = 0
+        self.longest_read = 0.0
+        self.finished = False  # The source ran out, rather than being stopped
+
+    @property
+    def position(self):
+        """Seconds of the song played so far"""
+        return self.offset + self.frames * discord.opus.Encoder.FRAME_LENGTH / 1000
+
+    def read(self):
+        started = time.perf_counter()
+        data = self.source.read()
+        elapsed = time.perf_counter() - started
+
+        if data:
+            self.frames += 1
+        else:
+            self.finished = True
+        if elapsed > discord.opus.Encoder.FRAME_LENGTH / 1000:
+            self.slow_reads += 1
+            self.longest_read = max(self.longest_read, elapsed)
+        return data
+
+    def replace(self, source, offset):
+        """
+        Continue from another source of the same song (a seek), without the voice client noticing
+
+        Args:
+            source: The audio source to play from now on
+            offset: Position in seconds it starts at
+
+        Returns:
+            The source it replaces, for the caller to clean up once the voice thread is done with it
+        """
+        old_source = self.source
+        self.source = source
+        self.offset = offset
+        self.frames = 0
+        self.finished = False
+        return old_source
+
+    def is_opus(self):
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self.source.cleanup()
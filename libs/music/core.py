@@ -1,149 +1,307 @@
-from collections import deque
-from datetime import datetime, timedelta
-import os
-from mutagen import File
-from mutagen.mp3 import MP3
-from mutagen.wave import WAVE
-from mutagen.oggvorbis import OggVorbis
-from mutagen.m4a import M4A
-
-class MusicPlayer:
-    def __init__(self):
-        self.queue = deque()
-        self.current_song = None
-        self.is_playing = False
-        self.started_playing_at = None
-        self.is_paused = False
-        self.pause_duration = timedelta()
-        self.last_pause_time = None
-        self.current_update_task = None  # Store the current progress update task
-
-    def add_to_queue(self, song):
-        self.queue.append(song)
-
-    def get_next_song(self):
-        return self.queue.popleft() if self.queue else None
-
-    def clear_queue(self):
-        self.queue.clear()
-        self.current_song = None
-
-
-    def start_playback(self):
-        self.started_playing_at = datetime.now()
-        self.is_playing = True
-        self.is_paused = False
-        
-    def pause_playback(self):
-        if not self.is_paused:
-            self.is_paused = True
-            self.last_pause_time = datetime.now()
-
-    def resume_playback(self):
-        if self.is_paused:
-            self.is_paused = False
-            self.pause_duration += datetime.now() - self.last_pause_time
-            self.last_pause_time = None
-
-    def get_current_position(self):
-        """Get current position in seconds"""
-        if not self.started_playing_at:
-            return 0
-            
-        if self.is_paused:
-            elapsed = self.last_pause_time - self.started_playing_at - self.pause_duration
-        else:
-            elapsed = datetime.now() - self.started_playing_at - self.pause_duration
-            
-        return elapsed.total_seconds()
-
-    def create_progress_bar(self, length=20):
-        """Create a text-based progress bar using only ▬"""
-        if not self.current_song or not self.started_playing_at:
-            return "▬" * length
-            
-        position = self.get_current_position()
-        duration = self.current_song.duration
-        
-        if duration == 0:  # Avoid division by zero
-            return "▬" * length
-            
-        progress = min(position / duration, 1.0)
-        slider_pos = int(length * progress)
-        
-        # Create bar with all ▬
-        bar = "▬" * length
-        
-        # Insert slider at position
-        bar_list = list(bar)
-        slider_pos = min(slider_pos, length - 1)  # Ensure slider doesn't go past the end
-        bar_list[slider_pos] = "🔘"
-        return "".join(bar_list)
-
-class Song:
-    def __init__(self, filename, full_path, requester):
-        self.name = filename
-        self.full_path = full_path
-        self.requester = requester
-        self.added_at = datetime.now()
-        self.duration = self._get_duration()
-
-    def _get_duration(self):
-        """Get the duration of the audio file in seconds"""
-        try:
-            # Get file extension
-            ext = os.path.splitext(self.full_path)[1].lower()
-            
-            # Handle different audio formats
-            if ext == '.mp3':
-                audio = MP3(self.full_path)
-            elif ext == '.wav':
-                audio = WAVE(self.full_path)
-            elif ext == '.ogg':
-                audio = OggVorbis(self.full_path)
-            elif ext == '.m4a':
-                audio = M4A(self.full_path)
-            else:
-                # Fallback to generic file handler
-                audio = File(self.full_path)
-            
-            # Return duration in seconds
-            return int(audio.info.length)
-        except Exception as e:
-            print(f"Error getting duration for {self.name}: {e}")
-            return 0
-
-    @property
-    def formatted_duration(self):
-        """Format duration as mm:ss or hh:mm:ss if over an hour"""
-        duration = timedelta(seconds=self.duration)
-        
-        hours = duration.seconds // 3600
-        minutes = (duration.seconds % 3600) // 60
-        seconds = duration.seconds % 60
-        
-        if hours > 0:
-            return f"{hours}:{minutes:02d}:{seconds:02d}"
-        else:
-            return f"{minutes}:{seconds:02d}"
-
-# Create a custom Song object for streaming
-class StreamSong:
-    def __init__(self, source, requester):
-        self.name = source.title
-        self.duration = source.duration
-        self.requester = requester
-        self.stream_url = source.url
-        self.thumbnail = source.thumbnail
-        self.webpage_url = source.webpage_url
-        self.added_at = datetime.now()
-    @property
-    def formatted_duration(self):
-        duration = timedelta(seconds=self.duration)
-        hours = duration.seconds // 3600
-        minutes = (duration.seconds % 3600) // 60
-        seconds = duration.seconds % 60
-        return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
-
-# Shared music player instance for all commands
-players = {}
\ No newline at end of file
+import asyncio
+from datetime import datetime, timedelta
+import sys
+import time
+from types import SimpleNamespace
+from libs.music.resolve_cache import stream_url_expiry
+from libs.music.track_queue import TrackQueue
+
+# How long a stream URL is trusted when it doesn't carry an expire parameter
+STREAM_URL_TTL = 5 * 3600
+
+class MusicPlayer:
+    def __init__(self):
+        self.queue = TrackQueue()
+        self.queue_pages = None  # Rendered pages of the queue, created by -queue
+        self.text_channel_id = None  # Where the music commands were last used
+        self.voice_channel_id = None  # Voice channel the bot plays in
+        self.current_song = None
+        self.is_playing = False
+        self.started_playing_at = None
+        self.is_paused = False
+        self.pause_duration = timedelta()
+        self.last_pause_time = None
+        self.progress_message = None  # Now Playing message kept up to date by the ProgressScheduler
+        self.lookahead_task = None  # Keeps upcoming stream URLs fresh
+        self.queue_changed = asyncio.Event()  # Wakes the lookahead when songs are added
+        self.preload_task = None  # Pre-opens the next song's source near the end of the current one
+        self.preloaded_song = None
+        self.preloaded_source = None
+        self.song_ended_at = None  # When the last song ended (perf_counter), to measure gaps
+        self.last_gap = None  # Silence between the last two songs in seconds
+        self.last_active = time.monotonic()  # Last time a song was queued, started or stopped
+        self.playing_source = None  # FrameCountingSource of the current song, knows the exact position
+        self.resume_attempts = 0  # Times the current song was restarted after ending too early
+        self.restored = False  # Brought back after a restart and not used since, kept until someone comes back for it
+
+    def touch(self):
+        """Mark the player as in use, which pushes back its idle eviction"""
+        self.last_active = time.monotonic()
+
+    def idle_for(self):
+        """Seconds since the player was last used (0 while playing)"""
+        if self.is_playing:
+            return 0
+        return time.monotonic() - self.last_active
+
+    def add_to_queue(self, song):
+        self.queue.append(song)
+        self.queue_changed.set()
+        self.touch()
+
+    def get_next_song(self):
+        if not self.queue:
+            return None
+        self.queue_changed.set()
+        return self.queue.popleft()
+
+    def remove_song(self, index):
+        """Remove and return the song at a (0-based) queue position"""
+        song = self.queue.pop(index)
+        self.queue_changed.set()
+        return song
+
+    def remove_songs(self, start, stop):
+        """Remove and return the songs between two (0-based) queue positions, stop exclusive"""
+        removed = self.queue.remove_range(start, stop)
+        self.queue_changed.set()
+        return removed
+
+    def move_song(self, source, destination):
+        """Move a song to another (0-based) queue position and return it"""
+        song = self.queue.move(source, destination)
+        self.queue_changed.set()
+        return song
+
+    def shuffle_queue(self):
+        self.queue.shuffle()
+        self.queue_changed.set()
+
+    def clear_queue(self):
+        self.queue.clear()
+        self.current_song = None
+        self.playing_source = None
+        self.touch()
+
+    def set_preloaded(self, song, source):
+        """Keep a pre-opened source for the song expected to play next"""
+        self.discard_preloaded()
+        self.preloaded_song = song
+        self.preloaded_source = source
+
+    def take_preloaded(self, song):
+        """Get the pre-opened source for song, if the preloaded one is for that song"""
+        if self.preloaded_song is not song:
+            self.discard_preloaded()
+            return None
+        source = self.preloaded_source
+        self.preloaded_song = None
+        self.preloaded_source = None
+        return source
+
+    def discard_preloaded(self):
+        """Close a pre-opened source that won't be played (stops its ffmpeg process)"""
+        if self.preloaded_source is not None:
+            self.preloaded_source.cleanup()
+        self.preloaded_song = None
+        self.preloaded_source = None
+
+    def cancel_song_tasks(self):
+        """Cancel the work tied to the current song (preloading and progress updates)"""
+        if self.preload_task and not self.preload_task.done():
+            self.preload_task.cancel()
+        self.preload_task = None
+        self.progress_message = None
+
+    def release(self):
+        """Cancel everything still running for this player and close any pre-opened source"""
+        self.cancel_song_tasks()
+        self.discard_preloaded()
+        if self.lookahead_task and not self.lookahead_task.done():
+            self.lookahead_task.cancel()
+        self.lookahead_task = None
+
+    def start_playback(self, source=None):
+        """Mark the current song as started, source being the FrameCountingSource it plays from"""
+        self.playing_source = source
+        self.started_playing_at = datetime.now()
+        self.is_playing = True
+        self.is_paused = False
+        self.restored = False
+        self.touch()
+        
+    def pause_playback(self):
+        if not self.is_paused:
+            self.is_paused = True
+            self.last_pause_time = datetime.now()
+
+    def resume_playback(self):
+        if self.is_paused:
+            self.is_paused = False
+            self.pause_duration += datetime.now() - self.last_pause_time
+            self.last_pause_time = None
+
+    def get_current_position(self):
+        """Get current position in seconds"""
+        if self.playing_source is not None:
+            # Counted from the frames actually sent
+            return self.playing_source.position
+
+        if not self.started_playing_at:
+            return 0
+            
+        if self.is_paused:
+            elapsed = self.last_pause_time - self.started_playing_at - self.pause_duration
+        else:
+            elapsed = datetime.now() - self.started_playing_at - self.pause_duration
+            
+        return elapsed.total_seconds()
+
+    def create_progress_bar(self, length=20):
+        """Create a text-based progress bar using only ▬"""
+        if not self.current_song or not self.started_playing_at:
+            return "▬" * length
+            
+        position = self.get_current_position()
+        duration = self.current_song.duration
+        
+        if duration == 0:  # Avoid division by zero
+            return "▬" * length
+            
+        progress = min(position / duration, 1.0)
+        slider_pos = int(length * progress)
+        
+        # Create bar with all ▬
+        bar = "▬" * length
+        
+        # Insert slider at position
+        bar_list = list(bar)
+        slider_pos = min(slider_pos, length - 1)  # Ensure slider doesn't go past the end
+        bar_list[slider_pos] = "🔘"
+        return "".join(bar_list)
+
+def intern_string(value):
+    """Share one copy of strings that repeat across queues and guilds (None stays None)"""
+    return sys.intern(value) if value else value
+
+class Track:
+    """
+    Fields shared by local and streamed songs
+
+    Tracks use __slots__ and keep the requester as an id plus an interned
+    name and avatar URL instead of a reference to the discord.Member, so a
+    queued song costs a couple hundred bytes however long it waits.
+    """
+    __slots__ = ('name', 'duration', 'requester_id', 'requester_name', 'requester_avatar',
+                 'added_at', 'counted_duration', 'resume_position', 'gain')
+
+    def __init__(self, name, requester, duration=0):
+        self.name = intern_string(name)
+        self.duration = duration
+        self.set_requester(requester)
+        self.added_at = time.time()
+        self.counted_duration = 0  # Duration the TrackQueue counted this song with
+        self.resume_position = 0  # Seconds into the song to start from (restored after a restart)
+        self.gain = 0.0  # Loudness normalization in dB, fixed when the song starts playing
+
+    def set_requester(self, requester):
+        """Remember who asked for the song (a member, or anything with id, display_name and avatar)"""
+        self.requester_id = requester.id
+        self.requester_name = intern_string(requester.display_name)
+        avatar = getattr(requester, 'avatar', None)
+        self.requester_avatar = intern_string(avatar.url if avatar else None)
+
+    @property
+    def formatted_duration(self):
+        """Format duration as mm:ss or hh:mm:ss if over an hour"""
+        duration = timedelta(seconds=self.duration)
+        
+        hours = duration.seconds // 3600
+        minutes = (duration.seconds % 3600) // 60
+        seconds = duration.seconds % 60
+        
+        if hours > 0:
+            return f"{hours}:{minutes:02d}:{seconds:02d}"
+        else:
+            return f"{minutes}:{seconds:02d}"
+
+class Song(Track):
+    __slots__ = ('full_path',)
+
+    def __init__(self, filename, full_path, requester, duration=0):
+        # Probed ahead of time (off the event loop) by the audio library / DurationProber
+        super().__init__(filename, requester, duration)
+        self.full_path = intern_string(full_path)
+
+# Create a custom Song object for streaming
+class StreamSong(Track):
+    __slots__ = ('thumbnail', 'webpage_url', 'codec', 'stream_url', 'expires_at')
+
+    def __init__(self, source, requester):
+        super().__init__(source.title, requester, source.duration)
+        self.thumbnail = intern_string(source.thumbnail)
+        self.webpage_url = intern_string(source.webpage_url)
+        self.codec = intern_string(getattr(source, 'codec', None))  # Audio codec of the stream, e.g. 'opus'
+        self.set_stream_url(source.url)
+
+    def set_stream_url(self, url):
+        """Store a (re-)resolved stream URL along with when it stops working"""
+        self.stream_url = url
+        self.expires_at = None
+        if url:
+            self.expires_at = stream_url_expiry(url) or time.time() + STREAM_URL_TTL
+
+    def refresh_due_in(self, margin=0):
+        """
+        Seconds until the stream URL has to be resolved again before playing (negative once it has to)
+
+        The URL has to stay valid until the song has finished, so the song's own
+        duration is added to the margin. No URL lives long enough for a song
+        longer than that (a 10 hour mix), so at most half of a URL's usual
+        lifetime is asked for: a fresh URL counts as good, and a stream that
+        expires mid-song resumes from where it dropped.
+        """
+        if not self.stream_url:
+            return 0
+        required = min(margin + self.duration, STREAM_URL_TTL / 2)
+        return self.expires_at - time.time() - required
+
+    def needs_refresh(self, margin=0):
+        """Check if the stream URL has to be resolved again before playing"""
+        return not self.stream_url or self.refresh_due_in(margin) < 0
+
+    def refresh(self, result):
+        """Update the song from a fresh YTDL stream result"""
+        self.set_stream_url(result.get('url'))
+        if result.get('duration'):
+            self.duration = int(result['duration'])
+        if result.get('thumbnail'):
+            self.thumbnail = intern_string(result['thumbnail'])
+        if result.get('acodec'):
+            self.codec = intern_string(result['acodec'])
+
+    @classmethod
+    def from_result(cls, result, requester):
+        """Create a StreamSong straight from a YTDL result dict, without an audio source"""
+        source = SimpleNamespace(
+            title=result.get('title', 'Unknown'),
+            duration=int(result.get('duration') or 0),
+            url=result.get('url'),
+            thumbnail=result.get('thumbnail'),
+            webpage_url=result.get('webpage_url'),
+            codec=result.get('acodec')
+        )
+        return cls(source, requester)
+
+# Shared music player instance for all commands
+players = {}
+
+def get_player(guild_id):
+    """Get a guild's player, creating it on first use"""
+    player = players.get(guild_id)
+    if player is None:
+        player = players[guild_id] = MusicPlayer()
+    # About to be used, keep the idle eviction away from it
+    player.restored = False
+    player.touch()
+    return player
\ No newline at end of file
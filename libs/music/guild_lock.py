@@ -0,0 +1,119 @@
+import asyncio
+import functools
+import os
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+
+# Sent when a guild already has as many commands in line as it may
+BUSY_MESSAGE = "⏳ I'm still working through the last few commands here, please try again in a moment."
+
+class GuildBusy(Exception):
+    """Raised when a guild already has too many commands waiting for its lock"""
+
+class GuildLocks:
+    """
+    One lock per guild so its music commands and song transitions change the player one at a time
+
+    Commands of the same guild run in the order they arrive, commands of
+    different guilds never wait for each other. Each guild may only have
+    `max_pending` commands running or waiting at once, further commands are
+    turned away instead of piling up behind a slow one. A -play counts from
+    the moment it arrives, its search included, so a burst of them can't
+    flood the shared YTDL workers. Song transitions started by the voice
+    thread are never turned away.
+    """
+
+    def __init__(self, max_pending=5):
+        """
+        Initialize the locks
+
+        Args:
+            max_pending: Commands a guild may have running or waiting at once
+        """
+        self.max_pending = max_pending
+        self.locks = {}  # guild id -> asyncio.Lock, only while something holds or waits for it
+        self.pending = {}  # guild id -> commands and transitions in progress (searching, waiting or holding the lock)
+        self.rejected = 0
+
+    def busy(self, guild_id):
+        """Check if a guild has no room for another command right now"""
+        return self.pending.get(guild_id, 0) >= self.max_pending
+
+    @contextmanager
+    def reserve(self, guild_id, bounded=True):
+        """
+        Count a command as in progress for a guild until it's done, without taking the lock
+
+        Args:
+            guild_id: Guild the command changes
+            bounded: Whether to give up with GuildBusy when the guild has too many in progress
+
+        Raises:
+            GuildBusy: The guild has no room for another command
+        """
+        if bounded and self.busy(guild_id):
+            self.rejected += 1
+            raise GuildBusy(guild_id)
+
+        self.pending[guild_id] = self.pending.get(guild_id, 0) + 1
+        try:
+            yield
+        finally:
+            self.pending[guild_id] -= 1
+            if not self.pending[guild_id]:
+                # Nothing in progress anymore, don't keep a lock for every guild ever seen
+                del self.pending[guild_id]
+                self.locks.pop(guild_id, None)
+
+    @asynccontextmanager
+    async def hold(self, guild_id, bounded=True, reserved=False):
+        """
+        Hold a guild's lock, waiting for the commands ahead of this one
+
+        Args:
+            guild_id: Guild whose player is about to change
+            bounded: Whether to give up with GuildBusy when too many commands are in progress
+            reserved: The caller already counts as in progress through reserve()
+
+        Raises:
+            GuildBusy: The guild has no room for another command
+        """
+        with nullcontext() if reserved else self.reserve(guild_id, bounded):
+            lock = self.locks.get(guild_id)
+            if lock is None:
+                lock = self.locks[guild_id] = asyncio.Lock()
+            async with lock:
+                yield
+
+    def serialized(self, command):
+        """
+        Decorator running a command callback with its guild's lock held
+
+        Put it below @bot.command, the command keeps its name, help and parameters.
+        """
+        @functools.wraps(command)
+        async def wrapper(ctx, *args, **kwargs):
+            try:
+                async with self.hold(ctx.guild.id):
+                    return await command(ctx, *args, **kwargs)
+            except GuildBusy:
+                await ctx.send(BUSY_MESSAGE)
+        return wrapper
+
+    def counted(self, command):
+        """
+        Decorator counting a command as in progress from start to end, without holding the lock
+
+        For commands that do slow work (a search) before changing the player,
+        they take the lock themselves with hold(..., reserved=True).
+        """
+        @functools.wraps(command)
+        async def wrapper(ctx, *args, **kwargs):
+            try:
+                with self.reserve(ctx.guild.id):
+                    return await command(ctx, *args, **kwargs)
+            except GuildBusy:
+                await ctx.send(BUSY_MESSAGE)
+        return wrapper
+
+# Shared by all music commands and the player's song transitions
+guild_locks = GuildLocks(max_pending=int(os.getenv('MAX_PENDING_COMMANDS', '5')))
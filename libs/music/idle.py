@@ -0,0 +1,84 @@
+import asyncio
+
+class VoiceIdleManager:
+    """
+    Single task that leaves voice channels nobody is using anymore
+
+    A voice connection keeps a UDP socket, a keepalive thread and encoder
+    state alive even when nothing plays, so every pass checks the bot's
+    voice clients and hands those that have been silent for too long, or
+    alone without any human listeners, to the release function.
+    """
+
+    def __init__(self, release, silence_timeout=300, alone_timeout=60, tick=15):
+        """
+        Initialize the manager
+
+        Args:
+            release: Coroutine function taking a guild and a reason ('silence' or 'alone') that disconnects it
+            silence_timeout: Seconds without audio (nothing queued, or paused) before disconnecting
+            alone_timeout: Seconds without humans in the channel before disconnecting
+            tick: Seconds between checks
+        """
+        self.release = release
+        self.silence_timeout = silence_timeout
+        self.alone_timeout = alone_timeout
+        self.tick = tick
+
+        self.silent_since = {}  # guild id -> loop time the audio stopped
+        self.alone_since = {}  # guild id -> loop time the last human left
+        self.disconnects = 0
+        self._task = None
+
+    def start(self, bot):
+        """Start checking the bot's voice clients (only once, on_ready can fire again after reconnects)"""
+        if self._task is None or self._task.done():
+            self._task = bot.loop.create_task(self.run(bot))
+
+    def check(self, guild_id, voice_client, now):
+        """
+        Update a voice client's idle timers
+
+        Returns:
+            'silence' or 'alone' if it should be disconnected, None otherwise
+        """
+        if voice_client.is_playing():
+            self.silent_since.pop(guild_id, None)
+        elif now - self.silent_since.setdefault(guild_id, now) >= self.silence_timeout:
+            return 'silence'
+
+        channel = voice_client.channel
+        if channel is not None and any(not member.bot for member in channel.members):
+            self.alone_since.pop(guild_id, None)
+        elif now - self.alone_since.setdefault(guild_id, now) >= self.alone_timeout:
+            return 'alone'
+
+        return None
+
+    async def run(self, bot):
+        """Checker loop"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.tick)
+            now = loop.time()
+
+            connected = set()
+            for voice_client in list(bot.voice_clients):
+                guild = voice_client.guild
+                connected.add(guild.id)
+                reason = self.check(guild.id, voice_client, now)
+                if reason is None:
+                    continue
+
+                self.silent_since.pop(guild.id, None)
+                self.alone_since.pop(guild.id, None)
+                try:
+                    await self.release(guild, reason)
+                    self.disconnects += 1
+                except Exception as e:
+                    print(f"Error leaving idle voice channel in {guild.name}: {e}")
+
+            # Forget guilds that were disconnected some other way
+            for timers in (self.silent_since, self.alone_since):
+                for guild_id in timers.keys() - connected:
+                    del timers[guild_id]
@@ -0,0 +1,291 @@
+import bisect
+import difflib
+import os
+import re
+import threading
+
+# Audio files the library picks up
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.m4a')
+
+def normalize_title(title):
+    """Lowercase a title and treat underscores and repeated whitespace as single spaces"""
+    return " ".join(title.lower().replace('_', ' ').split())
+
+class LibraryEntry:
+    """A single indexed audio file"""
+
+    def __init__(self, path, root, size, mtime, duration=0):
+        self.path = path
+        self.name = os.path.basename(path)  # Filename with extension
+        self.ext = os.path.splitext(path)[1].lower()
+        self.title = os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, '/')
+        self.key = normalize_title(self.title)
+        self.size = size
+        self.mtime = mtime
+        self.duration = duration
+
+class LibraryIndex:
+    """Lookup structures for one version of the library, replaced as a whole on changes"""
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}  # path -> LibraryEntry
+        self.by_key = {}  # normalized title -> LibraryEntry
+        self.by_basename = {}  # normalized basename -> [LibraryEntry]
+        self.token_index = {}  # word -> set of normalized titles, for fuzzy search
+
+        for entry in self.entries.values():
+            self.by_key[entry.key] = entry
+            basename = entry.key.rsplit('/', 1)[-1]
+            self.by_basename.setdefault(basename, []).append(entry)
+            for token in re.findall(r'\w+', entry.key):
+                self.token_index.setdefault(token, set()).add(entry.key)
+
+        # Normalized titles and basenames, for prefix search
+        self.sorted_keys = sorted(self.by_key.keys() | self.by_basename.keys())
+
+class AudioLibrary:
+    """In-memory index of the local audio folder with exact, prefix and fuzzy lookup"""
+
+    def __init__(self, root='audio', extensions=AUDIO_EXTENSIONS, probe_duration=None):
+        """
+        Initialize an empty index (call scan() or start_watching() to fill it)
+
+        Args:
+            root: Folder holding the audio files
+            extensions: File extensions to index
+            probe_duration: Function returning a file's duration in seconds (blocking)
+        """
+        self.root = root
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.probe_duration = probe_duration
+
+        # The index is rebuilt by the scanner and swapped in whole,
+        # so readers on the event loop never see a half updated index
+        self.index = LibraryIndex()
+
+        self._dir_listings = {}  # directory -> (mtime, [file paths], [subdirectories])
+        self._scan_lock = threading.Lock()
+        self._watcher = None
+        self.ready = threading.Event()
+
+    def scan(self):
+        """
+        Bring the index up to date with the folder (blocking, runs off the event loop)
+
+        Only directories whose mtime changed are listed again, and only new or
+        changed files are probed, so refreshing a large unchanged library is cheap.
+        The names are published before probing, so files can be found by name
+        while their durations are still being read.
+
+        Returns:
+            Tuple of (files added or changed, files removed)
+        """
+        with self._scan_lock:
+            paths = self._list_files()
+
+            current = self.index.entries
+            entries = {}
+            unprobed = []
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                entry = current.get(path)
+                if entry is None or entry.size != stat.st_size or entry.mtime != stat.st_mtime:
+                    entry = LibraryEntry(path, self.root, stat.st_size, stat.st_mtime)
+                    unprobed.append(entry)
+                entries[path] = entry
+
+            removed = len(current.keys() - entries.keys())
+            if unprobed or removed or not self.ready.is_set():
+                self.index = LibraryIndex(entries)
+
+            # Durations are filled in on the published entries, 0 meanwhile means unknown
+            for entry in unprobed:
+                entry.duration = self._probe(entry.path)
+            self.ready.set()
+            return len(unprobed), removed
+
+    def _list_files(self):
+        """List every audio file under the root, reusing listings of unchanged directories"""
+        paths = []
+        listings = {}
+        pending = [self.root]
+
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                continue
+
+            cached = self._dir_listings.get(directory)
+            if cached and cached[0] == mtime:
+                files, subdirs = cached[1], cached[2]
+            else:
+                files, subdirs = [], []
+                try:
+                    with os.scandir(directory) as it:
+                        for item in it:
+                            if item.is_dir(follow_symlinks=False):
+                                subdirs.append(item.path)
+                            elif os.path.splitext(item.name)[1].lower() in self.extensions:
+                                files.append(item.path)
+                except OSError:
+                    continue
+
+            listings[directory] = (mtime, files, subdirs)
+            paths.extend(files)
+            pending.extend(subdirs)
+
+        self._dir_listings = listings
+        return paths
+
+    def _probe(self, path):
+        """Get a file's duration, 0 if unknown"""
+        if self.probe_duration is None:
+            return 0
+        try:
+            return self.probe_duration(path)
+        except Exception as e:
+            print(f"Error getting duration for {path}: {e}")
+            return 0
+
+    @property
+    def entries(self):
+        """Indexed files by path"""
+        return self.index.entries
+
+    def find_file(self, query):
+        """
+        Look for a file named exactly like the query on disk, without the index (blocking)
+
+        Used until the first scan has finished, so a file can be played by its
+        exact name right after startup.
+
+        Args:
+            query: Path of the file below the root, without extension
+
+        Returns:
+            LibraryEntry or None
+        """
+        for ext in self.extensions:
+            path = os.path.join(self.root, f"{query}{ext}")
+            try:
+                stat = os.stat(path)
+            except (OSError, ValueError):
+                continue
+            return LibraryEntry(path, self.root, stat.st_size, stat.st_mtime)
+        return None
+
+    def start_watching(self, interval=30):
+        """Build the index and keep it up to date from a background thread"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while True:
+                try:
+                    added, removed = self.scan()
+                    if added or removed:
+                        print(f"Audio library: {len(self.entries)} files ({added} new or changed, {removed} removed)")
+                except Exception as e:
+                    print(f"Error scanning audio library: {e}")
+                threading.Event().wait(interval)
+
+        self._watcher = threading.Thread(target=watch, name="audio-library-watcher", daemon=True)
+        self._watcher.start()
+
+    def find(self, query, fuzzy=True, cutoff=0.85, min_prefix=3):
+        """
+        Find the file best matching a query
+
+        Exact titles win, then a unique prefix match, then a close fuzzy match.
+        Exact and prefix lookups are O(1) and O(log n), fuzzy matching is slower
+        and can be skipped (or run in an executor).
+
+        Args:
+            query: Title typed by the user (without extension)
+            fuzzy: Whether to fall back to fuzzy matching
+            cutoff: Minimum similarity (0-1) for fuzzy matches
+            min_prefix: Shortest query that is matched as a prefix
+
+        Returns:
+            LibraryEntry or None
+        """
+        key = normalize_title(query)
+        if not key:
+            return None
+
+        # Exact title (with or without folder)
+        index = self.index
+        entry = index.by_key.get(key)
+        if entry is not None:
+            return entry
+        matches = index.by_basename.get(key)
+        if matches and len(matches) == 1:
+            return matches[0]
+
+        # Unique prefix
+        if len(key) >= min_prefix:
+            prefixed = self.prefix_matches(key, limit=2)
+            if len(prefixed) == 1:
+                return prefixed[0]
+
+        if not fuzzy:
+            return None
+        matches = self.fuzzy_matches(key, limit=1, cutoff=cutoff)
+        return matches[0] if matches else None
+
+    def prefix_matches(self, query, limit=10):
+        """Files whose title (or basename) starts with the query, in alphabetical order"""
+        key = normalize_title(query)
+        index = self.index
+        keys = index.sorted_keys
+        found = []
+        seen = set()
+
+        position = bisect.bisect_left(keys, key)
+        while position < len(keys) and keys[position].startswith(key) and len(found) < limit:
+            match = keys[position]
+            candidates = [index.by_key[match]] if match in index.by_key else index.by_basename[match]
+            for entry in candidates:
+                if entry.path not in seen:
+                    seen.add(entry.path)
+                    found.append(entry)
+            position += 1
+        return found[:limit]
+
+    def fuzzy_matches(self, query, limit=5, cutoff=0.6, max_candidates=200):
+        """
+        Files whose title is similar to the query, best first
+
+        Only titles sharing a (possibly misspelled) word with the query are
+        compared, so lookups stay fast for large libraries.
+        """
+        key = normalize_title(query)
+        index = self.index
+        vocabulary = index.token_index
+
+        candidates = set()
+        for token in re.findall(r'\w+', key):
+            close_tokens = [token] if token in vocabulary else difflib.get_close_matches(token, vocabulary.keys(), n=3, cutoff=0.75)
+            for close in close_tokens:
+                candidates.update(vocabulary[close])
+                if len(candidates) >= max_candidates:
+                    break
+
+        scored = []
+        for candidate in candidates:
+            basename = candidate.rsplit('/', 1)[-1]
+            score = max(
+                difflib.SequenceMatcher(None, key, candidate).ratio(),
+                difflib.SequenceMatcher(None, key, basename).ratio()
+            )
+            if score >= cutoff:
+                scored.append((score, candidate))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [index.by_key[candidate] for _, candidate in scored[:limit]]
@@ -0,0 +1,44 @@
+import asyncio
+from itertools import islice
+
+async def keep_queue_warm(player, refresh, depth=3, margin=600, max_sleep=60):
+    """
+    Background task that keeps the next few queued streams resolved
+
+    Stream URLs are re-resolved when they are missing or will expire within
+    `margin` seconds of the song finishing, so play_next can start from a
+    valid URL instead of resolving at the song boundary.
+
+    Args:
+        player: MusicPlayer whose queue should be kept warm
+        refresh: Coroutine function taking a StreamSong and a margin, re-resolving the song
+                 in place and returning True on success
+        depth: Number of upcoming queue entries to look at
+        margin: Seconds of validity a stream URL must have left after the song ends
+        max_sleep: Longest time between checks
+    """
+    while player.is_playing or player.queue:
+        player.queue_changed.clear()
+        upcoming = [song for song in islice(player.queue, depth) if hasattr(song, 'stream_url')]
+
+        failed = set()
+        for song in upcoming:
+            if song.needs_refresh(margin):
+                try:
+                    if not await refresh(song, margin):
+                        failed.add(id(song))
+                except Exception as e:
+                    print(f"Lookahead failed to resolve {song.name}: {e}")
+                    failed.add(id(song))
+
+        # Sleep until the first upcoming URL is due for a refresh, or the queue changes
+        # (songs that just failed wait for the next regular check instead of retrying right away)
+        sleep_for = max_sleep
+        for song in upcoming:
+            if song.expires_at is not None and id(song) not in failed:
+                sleep_for = min(sleep_for, max(song.refresh_due_in(margin), 1))
+
+        try:
+            await asyncio.wait_for(player.queue_changed.wait(), timeout=sleep_for)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,146 @@
+import os
+import re
+import sqlite3
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Integrated loudness line of ffmpeg's ebur128 summary, e.g. "    I:         -9.8 LUFS"
+INTEGRATED_PATTERN = re.compile(r'I:\s+(-?\d+(?:\.\d+)?) LUFS')
+
+# Anything quieter than this is (nearly) silent, boosting it would only amplify noise
+SILENCE_LUFS = -60.0
+
+def measure_loudness(location, max_seconds=120):
+    """
+    Measure the integrated loudness of a file or stream with ffmpeg's ebur128 filter (blocking)
+
+    Args:
+        location: File path or stream URL
+        max_seconds: Only the first this many seconds are analysed
+
+    Returns:
+        Integrated loudness in LUFS, None if it couldn't be measured
+    """
+    command = ['ffmpeg', '-nostdin', '-hide_banner', '-nostats']
+    if location.startswith(('http://', 'https://')):
+        command += ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+    command += ['-t', str(max_seconds), '-i', location, '-vn', '-af', 'ebur128=framelog=quiet', '-f', 'null', '-']
+
+    try:
+        output = subprocess.run(command, capture_output=True, timeout=max_seconds * 2).stderr
+    except Exception as e:
+        print(f"Error measuring loudness: {e}")
+        return None
+
+    matches = INTEGRATED_PATTERN.findall(output.decode('utf-8', 'replace'))
+    return float(matches[-1]) if matches else None
+
+class LoudnessAnalyzer:
+    """
+    Background loudness analysis of queued tracks, remembered per track
+
+    Tracks are measured once, off the event loop, before they play, and
+    only from local data (audio files and transcode cache copies), never by
+    downloading a stream again. At playback their loudness turns into a
+    single static gain that ffmpeg applies, so there is no second loudnorm
+    pass and no per-frame work in Python. Tracks within `tolerance` of the
+    target keep their gain at 0, which lets Opus streams keep passing
+    through without re-encoding, any other gain costs that passthrough.
+    """
+
+    def __init__(self, target=-14.0, tolerance=2.0, max_boost=6.0, max_cut=15.0,
+                 max_seconds=120, db_path=None, max_workers=1):
+        """
+        Initialize the analyzer
+
+        Args:
+            target: Loudness (LUFS) every track is brought to
+            tolerance: Gains smaller than this many dB aren't applied
+            max_boost: Largest gain in dB
+            max_cut: Largest attenuation in dB
+            max_seconds: Seconds of each track that are analysed
+            db_path: Optional SQLite file that keeps measurements across restarts
+            max_workers: Tracks analysed at the same time
+        """
+        self.target = target
+        self.tolerance = tolerance
+        self.max_boost = max_boost
+        self.max_cut = max_cut
+        self.max_seconds = max_seconds
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="loudness")
+        self.loudness = {}  # track key -> LUFS (None if it couldn't be measured)
+        self.pending = set()
+        self._lock = threading.Lock()
+
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS loudness ("
+                "key TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, lufs REAL)"
+            )
+            self.db.commit()
+
+    def gain_for(self, key):
+        """
+        Get the gain to play a track with, without waiting for anything
+
+        Returns:
+            Gain in dB (0 while the track hasn't been measured)
+        """
+        lufs = self.loudness.get(key)
+        if lufs is None or lufs <= SILENCE_LUFS:
+            return 0.0
+        gain = min(max(self.target - lufs, -self.max_cut), self.max_boost)
+        return round(gain, 1) if abs(gain) >= self.tolerance else 0.0
+
+    def schedule(self, key, location):
+        """
+        Measure a track in the background unless it's known or already being measured
+
+        Args:
+            key: Track key, a video ID or a local file path
+            location: Local file to read the audio from
+        """
+        with self._lock:
+            if key in self.loudness or key in self.pending:
+                return
+            self.pending.add(key)
+        self.executor.submit(self.analyze, key, location)
+
+    def analyze(self, key, location):
+        """Look a track up in the database, or measure it (blocking)"""
+        try:
+            # Local files (keyed by their path) are measured again when they change
+            size, mtime = 0, 0.0
+            if key == location:
+                stat = os.stat(location)
+                size, mtime = stat.st_size, stat.st_mtime
+
+            if self.db is not None:
+                with self._lock:
+                    row = self.db.execute(
+                        "SELECT size, mtime, lufs FROM loudness WHERE key = ?", (key,)
+                    ).fetchone()
+                if row is not None and tuple(row[:2]) == (size, mtime):
+                    self.loudness[key] = row[2]
+                    return
+
+            lufs = measure_loudness(location, self.max_seconds)
+            self.loudness[key] = lufs
+            if self.db is not None and lufs is not None:
+                with self._lock:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO loudness (key, size, mtime, lufs) VALUES (?, ?, ?, ?)",
+                        (key, size, mtime, lufs)
+                    )
+                    self.db.commit()
+        except Exception as e:
+            print(f"Error analysing loudness of {key}: {e}")
+        finally:
+            with self._lock:
+                self.pending.discard(key)
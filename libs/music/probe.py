@@ -0,0 +1,108 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+def get_audio_duration(path):
+    """Get the duration of an audio file in seconds (blocking, parses the file)"""
+    # mutagen is only loaded once a file actually has to be probed
+    from mutagen import File
+    from mutagen.mp3 import MP3
+    from mutagen.wave import WAVE
+    from mutagen.oggvorbis import OggVorbis
+    from mutagen.m4a import M4A
+
+    # Get file extension
+    ext = os.path.splitext(path)[1].lower()
+
+    # Handle different audio formats
+    if ext == '.mp3':
+        audio = MP3(path)
+    elif ext == '.wav':
+        audio = WAVE(path)
+    elif ext == '.ogg':
+        audio = OggVorbis(path)
+    elif ext == '.m4a':
+        audio = M4A(path)
+    else:
+        # Fallback to generic file handler
+        audio = File(path)
+
+    # Return duration in seconds
+    return int(audio.info.length)
+
+class DurationProber:
+    """Thread pool backed duration probing, memoized by (path, size, mtime)"""
+
+    def __init__(self, db_path=None, max_workers=2):
+        """
+        Initialize the prober
+
+        Args:
+            db_path: Optional SQLite file that keeps probed durations across restarts
+                (opened on the first probe, processes that never probe don't touch it)
+            max_workers: Threads used for probing
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio-probe")
+        self.cache = {}  # path -> (size, mtime, duration)
+        self._lock = threading.Lock()
+        self.db_path = db_path
+        self.db = None
+
+    def _open_db(self):
+        """Connect to the SQLite file on first use (called with the lock held)"""
+        if self.db is not None or not self.db_path:
+            return
+        db = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS probe_cache ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, duration INTEGER NOT NULL)"
+        )
+        db.commit()
+        self.db = db
+
+    def probe(self, path):
+        """
+        Get a file's duration in seconds, parsing it only if it changed (blocking)
+
+        Raises:
+            OSError if the file can't be read, mutagen errors if it can't be parsed
+        """
+        stat = os.stat(path)
+        key = (stat.st_size, stat.st_mtime)
+
+        with self._lock:
+            cached = self.cache.get(path)
+            if cached is None:
+                self._open_db()
+            if cached is None and self.db is not None:
+                cached = self.db.execute(
+                    "SELECT size, mtime, duration FROM probe_cache WHERE path = ?", (path,)
+                ).fetchone()
+            if cached is not None and tuple(cached[:2]) == key:
+                self.cache[path] = tuple(cached)
+                return cached[2]
+
+        duration = get_audio_duration(path)
+
+        with self._lock:
+            self.cache[path] = key + (duration,)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO probe_cache (path, size, mtime, duration) VALUES (?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_mtime, duration)
+                )
+                self.db.commit()
+        return duration
+
+    async def get_duration(self, path):
+        """Get a file's duration in seconds without blocking the event loop (0 if unknown)"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, self.probe, path)
+        except Exception as e:
+            print(f"Error getting duration for {path}: {e}")
+            return 0
@@ -0,0 +1,139 @@
+import asyncio
+import discord
+
+class ProgressEntry:
+    """Scheduling state of one Now Playing message"""
+
+    def __init__(self, player, message, due):
+        self.player = player
+        self.message = message
+        self.next_due = due
+        self.last_bar = None  # Progress bar text of the last edit
+        self.editing = False  # An edit for this message is in flight
+
+class ProgressScheduler:
+    """
+    Single task that owns every Now Playing message and keeps the progress bars current
+
+    Messages are only edited when their progress bar text actually changed, and
+    all edits share one global budget: the interval between edits of a message
+    grows with the number of active messages and backs off while Discord is
+    rate limiting, so total edit volume stays bounded however many guilds play.
+    """
+
+    def __init__(self, render, base_interval=10, edits_per_second=2.0,
+                 max_in_flight=4, slow_edit=2.0, max_pressure=8.0, tick=1.0):
+        """
+        Initialize the scheduler
+
+        Args:
+            render: Function building the Now Playing embed for a player
+            base_interval: Seconds between edits of one message when there's no pressure
+            edits_per_second: Global budget of progress edits
+            max_in_flight: Maximum number of concurrent edit requests
+            slow_edit: Edits taking longer than this many seconds count as rate limit pressure
+            max_pressure: Largest factor the interval is stretched by under pressure
+            tick: Seconds between scheduler passes
+        """
+        self.render = render
+        self.base_interval = base_interval
+        self.edits_per_second = edits_per_second
+        self.max_in_flight = max_in_flight
+        self.slow_edit = slow_edit
+        self.max_pressure = max_pressure
+        self.tick = tick
+
+        self.entries = {}  # player -> ProgressEntry
+        self.pressure = 1.0  # Interval multiplier, raised on rate limits and decayed on fast edits
+        self.in_flight = 0
+        self.tokens = edits_per_second
+        self.edits = 0
+        self.skipped = 0
+        self._task = None
+
+    def register(self, player):
+        """Start keeping player.progress_message up to date (replaces the previous message)"""
+        loop = asyncio.get_running_loop()
+        self.entries[player] = ProgressEntry(player, player.progress_message, loop.time() + self.interval())
+
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self.run())
+
+    def unregister(self, player):
+        """Stop updating the player's message"""
+        self.entries.pop(player, None)
+
+    def interval(self):
+        """Seconds between edits of one message with the current load and pressure"""
+        # Spread the edit budget over all active messages
+        fair_share = len(self.entries) / self.edits_per_second
+        return max(self.base_interval, fair_share) * self.pressure
+
+    async def run(self):
+        """Scheduler loop, runs while there are messages to update"""
+        loop = asyncio.get_running_loop()
+        while self.entries:
+            self.tokens = min(self.tokens + self.edits_per_second * self.tick, self.edits_per_second)
+            now = loop.time()
+
+            # Most overdue first
+            due = [entry for entry in self.entries.values() if entry.next_due <= now and not entry.editing]
+            due.sort(key=lambda entry: entry.next_due)
+
+            for entry in due:
+                player = entry.player
+                if player.progress_message is not entry.message or not player.is_playing or not player.current_song:
+                    # Song ended or stopped
+                    self.entries.pop(player, None)
+                    continue
+
+                bar = player.create_progress_bar()
+                if bar == entry.last_bar:
+                    # Nothing visible changed, don't spend a request on it
+                    self.skipped += 1
+                    entry.next_due = now + self.interval()
+                    continue
+
+                if self.tokens < 1 or self.in_flight >= self.max_in_flight:
+                    # Out of budget, the rest waits for the next pass
+                    break
+
+                self.tokens -= 1
+                entry.last_bar = bar
+                entry.editing = True
+                self.in_flight += 1
+                loop.create_task(self._edit(entry))
+
+            await asyncio.sleep(self.tick)
+
+    async def _edit(self, entry):
+        """Edit one message, adjusting the pressure from how Discord responded"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await entry.message.edit(embed=self.render(entry.player))
+            self.edits += 1
+
+            if loop.time() - started > self.slow_edit:
+                # discord.py waited out a rate limit
+                self._raise_pressure()
+            else:
+                self.pressure = max(1.0, self.pressure * 0.9)
+        except discord.NotFound:
+            # Message was deleted
+            self.entries.pop(entry.player, None)
+        except discord.HTTPException as e:
+            if e.status == 429:
+                self._raise_pressure()
+            else:
+                print(f"Error updating progress: {e}")
+        except Exception as e:
+            print(f"Error updating progress: {e}")
+            self.entries.pop(entry.player, None)
+        finally:
+            self.in_flight -= 1
+            entry.editing = False
+            entry.next_due = loop.time() + self.interval()
+
+    def _raise_pressure(self):
+        self.pressure = min(self.pressure * 2, self.max_pressure)
@@ -0,0 +1,62 @@
+class QueuePages:
+    """
+    Rendered pages of a TrackQueue, cached until a change reaches them
+
+    Appending only touches the last page and removing a song only the pages
+    from its position on, so flipping through a long queue mostly costs a
+    dict lookup per page instead of rebuilding the listing.
+    """
+
+    def __init__(self, queue, render_line, page_size=10):
+        """
+        Initialize an empty cache
+
+        Args:
+            queue: TrackQueue to render
+            render_line: Function taking a 1-based position and a song, returning its line
+            page_size: Songs per page
+        """
+        self.queue = queue
+        self.render_line = render_line
+        self.page_size = page_size
+        self.pages = {}  # page number -> rendered text
+        self.version = queue.version
+        self.hits = 0
+        self.misses = 0
+
+    def page_count(self):
+        """Number of pages (an empty queue still has one, empty, page)"""
+        return max(1, -(-len(self.queue) // self.page_size))
+
+    def _sync(self):
+        """Drop the cached pages the queue changed under since the last look"""
+        changed_from = self.queue.changed_since(self.version)
+        if changed_from is not None:
+            first_stale = changed_from // self.page_size
+            self.pages = {page: text for page, text in self.pages.items() if page < first_stale}
+            self.version = self.queue.version
+
+    def get(self, page):
+        """
+        Get the text of a page
+
+        Args:
+            page: 0-based page number (clamped to the existing pages)
+
+        Returns:
+            The page's lines joined by newlines ("" for an empty queue)
+        """
+        self._sync()
+        page = min(max(page, 0), self.page_count() - 1)
+
+        text = self.pages.get(page)
+        if text is not None:
+            self.hits += 1
+            return text
+
+        self.misses += 1
+        start = page * self.page_size
+        songs = self.queue.slice(start, start + self.page_size)
+        text = "\n".join(self.render_line(position, song) for position, song in enumerate(songs, start + 1))
+        self.pages[page] = text
+        return text
@@ -0,0 +1,282 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, parse_qs
+
+# Seconds the background writer gathers changes before writing them in one transaction
+WRITE_BEHIND_INTERVAL = 1.0
+
+# Fields of a YTDL stream result worth remembering
+CACHED_FIELDS = ('title', 'duration', 'thumbnail', 'webpage_url', 'url', 'acodec')
+
+# YouTube video IDs, from watch?v=, youtu.be/, shorts/ and music.youtube.com links
+YOUTUBE_ID_PATTERN = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/)|youtu\.be/)([A-Za-z0-9_-]{11})'
+)
+
+def stream_url_expiry(url):
+    """
+    Get the expiry timestamp embedded in a googlevideo stream URL
+
+    Args:
+        url: Stream URL returned by yt-dlp
+
+    Returns:
+        Unix timestamp the URL stops working at, or None if the URL doesn't say
+    """
+    if not url:
+        return None
+
+    parsed = urlparse(url)
+    expire = parse_qs(parsed.query).get('expire')
+    if expire:
+        try:
+            return float(expire[0])
+        except ValueError:
+            return None
+
+    # Manifest style URLs carry it as a path segment: .../expire/1700000000/...
+    parts = parsed.path.split('/')
+    if 'expire' in parts:
+        index = parts.index('expire')
+        if index + 1 < len(parts) and parts[index + 1].isdigit():
+            return float(parts[index + 1])
+    return None
+
+def youtube_video_id(url):
+    """Get the video ID of a YouTube link, None for anything else"""
+    match = YOUTUBE_ID_PATTERN.search(url) if url else None
+    return match.group(1) if match else None
+
+def normalize_query(query):
+    """
+    Build the cache key for a search query or URL
+
+    Video URLs collapse to their video ID so different links to the same video
+    share an entry, searches are case and whitespace insensitive.
+    """
+    query = query.strip()
+    match = YOUTUBE_ID_PATTERN.search(query)
+    if match:
+        return f"yt:{match.group(1)}"
+    if query.startswith(('http://', 'https://')):
+        return f"url:{query}"
+    return "q:" + " ".join(query.lower().split())
+
+class ResolutionCache:
+    """
+    LRU cache of resolved tracks keyed by normalized query and video URL
+
+    With a SQLite file behind it, reads of keys that aren't in memory are
+    meant to run in an executor (see needs_load). Writes never block the
+    caller: new entries, deletions and access times are gathered and
+    written by a background thread in one transaction at a time, so a busy
+    shared file never stalls the event loop.
+    """
+
+    def __init__(self, max_entries=2000, ttl=7 * 24 * 3600, stream_ttl=5 * 3600,
+                 expiry_margin=300, db_path=None, max_db_entries=50000):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of keys kept in memory
+            ttl: Seconds a track's metadata stays valid
+            stream_ttl: Seconds a stream URL is trusted when it has no expire parameter
+            expiry_margin: Stream URLs this close to expiring count as expired
+            db_path: Optional SQLite file that keeps the cache across restarts
+            max_db_entries: Maximum number of keys kept in the SQLite file
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stream_ttl = stream_ttl
+        self.expiry_margin = expiry_margin
+        self.max_db_entries = max_db_entries
+
+        self.entries = OrderedDict()  # key -> entry dict, most recently used last
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()  # Guards the in-memory entries and queued writes, reads may run in an executor
+
+        self.db = None
+        self._db_lock = threading.Lock()
+        self._puts_since_prune = 0
+        self._writes = {}  # key -> (data, accessed) to store, None to delete
+        self._touched = {}  # key -> last access time, not yet written
+        self._write_wanted = threading.Event()
+        if db_path:
+            self._open_db(db_path)
+            threading.Thread(target=self._write_behind, name="resolve-cache-writer", daemon=True).start()
+
+    def _open_db(self, db_path):
+        """Open (and create if needed) the SQLite backing store"""
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS resolve_cache ("
+            "key TEXT PRIMARY KEY, data TEXT NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.commit()
+
+    def _make_entry(self, result):
+        """Build a cache entry from a YTDL result dict"""
+        now = time.time()
+        entry = {field: result.get(field) for field in CACHED_FIELDS}
+        entry['cached_at'] = now
+
+        # Stream URLs expire on their own schedule, separate from the metadata
+        expires_at = stream_url_expiry(entry['url'])
+        if expires_at is None:
+            expires_at = now + self.stream_ttl
+        entry['url_expires_at'] = expires_at
+        return entry
+
+    def needs_load(self, query):
+        """Check if looking a query up has to read SQLite, so get() should run in an executor"""
+        return self.db is not None and normalize_query(query) not in self.entries
+
+    def get(self, query):
+        """
+        Look up a query (blocking when needs_load() says so)
+
+        Args:
+            query: Search query or URL as typed by the user
+
+        Returns:
+            Result dict shaped like a YTDL stream result, or None on a miss.
+            If only the stream URL has expired, 'url' is None and 'webpage_url'
+            can be resolved directly instead of searching again.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None:
+            entry = self._db_get(key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        now = time.time()
+        if entry is None or now - entry['cached_at'] > self.ttl:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        if self.db is not None:
+            # Written with the next batch, keeps the pruning order close to real use
+            with self._lock:
+                self._touched[key] = now
+            self._write_wanted.set()
+        result = {field: entry.get(field) for field in CACHED_FIELDS}
+        result.update({'success': True, 'mode': 'stream', 'cached': True})
+        if entry['url_expires_at'] - self.expiry_margin <= now:
+            result['url'] = None
+        return result
+
+    def put(self, query, result):
+        """
+        Store a successful YTDL stream result under the query and its video URL
+
+        Args:
+            query: Search query or URL the result was resolved from
+            result: YTDL stream result dict
+        """
+        if not result.get('success') or result.get('mode') != 'stream':
+            return
+
+        entry = self._make_entry(result)
+        keys = {normalize_query(query)}
+        if entry['webpage_url']:
+            keys.add(normalize_query(entry['webpage_url']))
+
+        for key in keys:
+            self._remember(key, entry)
+        self._db_put(keys, entry)
+
+    def invalidate(self, query):
+        """Drop a query from the cache (e.g. after its stream URL failed to play)"""
+        key = normalize_query(query)
+        with self._lock:
+            self.entries.pop(key, None)
+        if self.db is not None:
+            with self._lock:
+                self._writes[key] = None
+            self._write_wanted.set()
+
+    def _remember(self, key, entry):
+        """Insert into the in-memory LRU, evicting the least recently used keys"""
+        with self._lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _db_get(self, key):
+        """Load an entry from SQLite, if there is a backing store (blocking)"""
+        if self.db is None:
+            return None
+        with self._db_lock:
+            row = self.db.execute("SELECT data FROM resolve_cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _db_put(self, keys, entry):
+        """Queue an entry to be written through to SQLite"""
+        if self.db is None:
+            return
+        data = json.dumps(entry)
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                self._writes[key] = (data, now)
+        self._write_wanted.set()
+
+    def _write_behind(self):
+        """Background thread writing queued changes, at most one transaction per WRITE_BEHIND_INTERVAL"""
+        while True:
+            self._write_wanted.wait()
+            time.sleep(WRITE_BEHIND_INTERVAL)
+            self._write_wanted.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing the resolution cache: {e}")
+
+    def flush(self):
+        """Write all queued changes now (blocking)"""
+        # Swap the pending changes out so new ones can be queued while these are written
+        with self._lock:
+            writes, self._writes = self._writes, {}
+            touched, self._touched = self._touched, {}
+        if not writes and not touched:
+            return
+
+        with self._db_lock:
+            stored = [(key, change[0], change[1]) for key, change in writes.items() if change is not None]
+            if stored:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO resolve_cache (key, data, accessed) VALUES (?, ?, ?)", stored
+                )
+            deleted = [(key,) for key, change in writes.items() if change is None]
+            if deleted:
+                self.db.executemany("DELETE FROM resolve_cache WHERE key = ?", deleted)
+            if touched:
+                self.db.executemany(
+                    "UPDATE resolve_cache SET accessed = MAX(accessed, ?) WHERE key = ?",
+                    [(accessed, key) for key, accessed in touched.items()]
+                )
+
+            self._puts_since_prune += len(stored)
+            if self._puts_since_prune >= 100:
+                self._puts_since_prune = 0
+                self.db.execute(
+                    "DELETE FROM resolve_cache WHERE key NOT IN "
+                    "(SELECT key FROM resolve_cache ORDER BY accessed DESC LIMIT ?)",
+                    (self.max_db_entries,)
+                )
+            self.db.commit()
@@ -0,0 +1,248 @@
+import json
+import os
+from libs.music.core import MusicPlayer, Song, StreamSong
+
+def encode_track(song):
+    """
+    Compact form of a queued song: [stream URL or file path, title, duration, requester id]
+
+    A song that was interrupted (e.g. the bot left an idle channel) gets its
+    resume position as a fifth item, so it still continues where it was.
+    """
+    reference = song.webpage_url if hasattr(song, 'stream_url') else song.full_path
+    if not reference:
+        return None
+    if song.resume_position:
+        return [reference, song.name, song.duration, song.requester_id, round(song.resume_position, 1)]
+    return [reference, song.name, song.duration, song.requester_id]
+
+def decode_track(track, get_requester):
+    """
+    Rebuild a song from its compact form
+
+    Streams come back without a stream URL, they are resolved again when they
+    near the head of the queue like any other unresolved entry.
+
+    Args:
+        track: List written by encode_track
+        get_requester: Function returning the requester object for a user id
+
+    Returns:
+        Song or StreamSong, None if a local file is gone
+    """
+    reference, title, duration, requester_id = track[:4]
+    requester = get_requester(requester_id)
+
+    if reference.startswith(('http://', 'https://')):
+        song = StreamSong.from_result({
+            'title': title,
+            'duration': duration,
+            'webpage_url': reference
+        }, requester)
+    elif os.path.exists(reference):
+        song = Song(os.path.basename(reference), reference, requester, duration=duration)
+    else:
+        return None
+
+    if len(track) > 4:
+        song.resume_position = track[4]
+    return song
+
+class PlayerSnapshots:
+    """
+    Crash safe snapshots of every guild's player in an append-only JSON lines file
+
+    Each guild has up to two live records: its queue, rewritten only when the
+    queue changed, and a small state record with the current song and position.
+    Snapshots append just the records that changed, the newest record of a
+    guild wins when loading, and the file is rewritten with only the live
+    records once it is mostly superseded ones. A torn last line from a crash
+    is skipped on load.
+    """
+
+    def __init__(self, path, compact_ratio=4):
+        """
+        Initialize the snapshot log
+
+        Args:
+            path: JSON lines file holding the snapshots
+            compact_ratio: Rewrite the file once it has this many lines per live record
+        """
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.latest = {}  # guild id -> {'queue': line, 'state': line, 'version': queue version}
+        self.lines_in_file = 0
+        self.torn = False  # The file ends in a partial line, appending would glue onto it
+
+    def collect(self, players):
+        """
+        Serialize the players whose state changed since the last snapshot
+
+        Runs on the event loop so it sees a consistent state, the writing
+        happens in write().
+
+        Returns:
+            List of JSON lines to append
+        """
+        lines = []
+        for guild_id, player in players.items():
+            if not player.queue and not player.current_song:
+                if guild_id in self.latest:
+                    lines.append(self._forget(guild_id))
+                continue
+
+            latest = self.latest.setdefault(guild_id, {})
+            if latest.get('version') != (id(player.queue), player.queue.version):
+                requesters = {}
+                tracks = []
+                for song in player.queue:
+                    track = encode_track(song)
+                    if track is not None:
+                        tracks.append(track)
+                        requesters[song.requester_id] = song.requester_name
+                latest['version'] = (id(player.queue), player.queue.version)
+                latest['queue'] = json.dumps({'g': guild_id, 't': 'queue', 'tracks': tracks, 'names': requesters},
+                                             separators=(',', ':'))
+                lines.append(latest['queue'])
+
+            song = player.current_song
+            state = json.dumps({
+                'g': guild_id,
+                't': 'state',
+                'text': player.text_channel_id,
+                'voice': player.voice_channel_id,
+                'current': encode_track(song) if song else None,
+                'name': song.requester_name if song else None,
+                'pos': round(player.get_current_position(), 1) if song else 0,
+                'paused': player.is_paused
+            }, separators=(',', ':'))
+            if latest.get('state') != state:
+                latest['state'] = state
+                lines.append(state)
+
+        # Players that were dropped altogether
+        for guild_id in list(self.latest.keys() - players.keys()):
+            lines.append(self._forget(guild_id))
+        return lines
+
+    def _forget(self, guild_id):
+        """Record that a guild has nothing left to restore"""
+        del self.latest[guild_id]
+        return json.dumps({'g': guild_id, 't': 'gone'})
+
+    def write(self, lines):
+        """Append lines to the file, or rewrite it if it's mostly stale (blocking)"""
+        live = sum(('queue' in latest) + ('state' in latest) for latest in self.latest.values())
+        if self.torn or self.lines_in_file + len(lines) > self.compact_ratio * live + 64:
+            self.compact()
+            return
+
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write("".join(line + "\n" for line in lines))
+            file.flush()
+            os.fsync(file.fileno())
+        self.lines_in_file += len(lines)
+
+    def compact(self):
+        """Rewrite the file with only the live records, atomically (blocking)"""
+        records = [
+            line
+            for latest in self.latest.values()
+            for line in (latest.get('queue'), latest.get('state'))
+            if line is not None
+        ]
+
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write("".join(line + "\n" for line in records))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        self.lines_in_file = len(records)
+        self.torn = False
+
+    def load(self):
+        """
+        Read the newest records of every guild (blocking)
+
+        Returns:
+            Dict of guild id -> {'queue': record, 'state': record}
+        """
+        saved = {}
+        self.latest = {}
+        self.lines_in_file = 0
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                for line in file:
+                    self.lines_in_file += 1
+                    self.torn = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                        guild_id = record['g']
+                        kind = record['t']
+                    except (ValueError, KeyError, TypeError):
+                        # Torn write from a crash
+                        continue
+
+                    if kind == 'gone':
+                        saved.pop(guild_id, None)
+                        self.latest.pop(guild_id, None)
+                    elif kind in ('queue', 'state'):
+                        saved.setdefault(guild_id, {})[kind] = record
+                        self.latest.setdefault(guild_id, {})[kind] = line.rstrip("\n")
+        except FileNotFoundError:
+            pass
+        return saved
+
+    def restore(self, saved, get_member):
+        """
+        Build a player from a guild's saved records, without resolving anything
+
+        The song that was playing goes back to the head of the queue and
+        remembers how far it got in `resume_position`.
+
+        Args:
+            saved: The guild's records as returned by load()
+            get_member: Function returning a guild member for a user id, or None
+
+        Returns:
+            MusicPlayer with the restored queue, or None if there's nothing to play
+        """
+        queue = saved.get('queue', {})
+        state = saved.get('state', {})
+        names = {int(user_id): name for user_id, name in queue.get('names', {}).items()}
+        if state.get('current'):
+            names.setdefault(state['current'][3], state.get('name'))
+
+        requesters = {}
+        def get_requester(user_id):
+            # One object per user, members who left keep their saved name
+            if user_id not in requesters:
+                requesters[user_id] = get_member(user_id) or SavedRequester(user_id, names.get(user_id))
+            return requesters[user_id]
+
+        player = MusicPlayer()
+        player.restored = True
+        player.text_channel_id = state.get('text')
+        player.voice_channel_id = state.get('voice')
+
+        if state.get('current'):
+            song = decode_track(state['current'], get_requester)
+            if song is not None:
+                song.resume_position = state.get('pos', 0)
+                player.queue.append(song)
+
+        for track in queue.get('tracks', []):
+            song = decode_track(track, get_requester)
+            if song is not None:
+                player.queue.append(song)
+
+        return player if player.queue else None
+
+class SavedRequester:
+    """Stand-in for a requester who is no longer a member of the guild"""
+
+    def __init__(self, user_id, name=None):
+        self.id = user_id
+        self.display_name = name or "Unknown user"
+        self.avatar = None
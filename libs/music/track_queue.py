@@ -0,0 +1,278 @@
+import random
+from collections import deque
+from itertools import chain, islice
+
+class TrackQueue:
+    """
+    Song queue with O(log n) positional access, insertion, removal and moves
+
+    Songs are kept in a list of chunks of at most 2 * chunk_size songs, with a
+    Fenwick tree over the chunk lengths to find the chunk holding a position.
+    Inserting into or deleting from a chunk only shifts that chunk, so every
+    positional operation costs O(log n + chunk_size) however long the queue is.
+
+    The total duration, the number of songs per requester and a version
+    counter (bumped on every change) are maintained as songs come and go.
+    Recent changes are logged with the first position they touched, so
+    views of the queue can tell which parts of it are still current.
+    """
+
+    def __init__(self, songs=(), chunk_size=256):
+        """
+        Initialize the queue
+
+        Args:
+            songs: Songs to start with
+            chunk_size: Target number of songs per chunk
+        """
+        self.chunk_size = chunk_size
+        self._chunks = []  # Lists of songs, in queue order
+        self._tree = []  # Fenwick tree over len(chunk) for each chunk
+        self._length = 0
+
+        self.total_duration = 0  # Seconds, as counted when the songs were queued
+        self.requester_counts = {}  # requester id -> number of queued songs
+        self.version = 0  # Bumped on every change
+        self.changes = deque(maxlen=64)  # (version, first position touched) of recent changes
+
+        self.extend(songs)
+
+    # Bookkeeping
+
+    def _rebuild_tree(self):
+        """Rebuild the Fenwick tree after chunks were added or removed, O(number of chunks)"""
+        tree = [len(chunk) for chunk in self._chunks]
+        for index in range(len(tree)):
+            parent = index | (index + 1)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        self._tree = tree
+
+    def _tree_add(self, chunk_index, delta):
+        """Adjust the length of one chunk in the Fenwick tree"""
+        tree = self._tree
+        while chunk_index < len(tree):
+            tree[chunk_index] += delta
+            chunk_index |= chunk_index + 1
+
+    def _locate(self, index):
+        """Find (chunk index, offset in chunk) of a position, O(log number of chunks)"""
+        tree = self._tree
+        chunk_index = -1
+        step = 1 << len(tree).bit_length()
+        while step:
+            probe = chunk_index + step
+            if probe < len(tree) and tree[probe] <= index:
+                index -= tree[probe]
+                chunk_index = probe
+            step >>= 1
+        return chunk_index + 1, index
+
+    def _normalize_index(self, index):
+        """Turn a (possibly negative) position into a valid non-negative one"""
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("queue index out of range")
+        return index
+
+    def _count(self, song):
+        """Add a song to the running totals"""
+        # Durations can change once a stream is resolved, remember what was counted
+        song.counted_duration = song.duration
+        self.total_duration += song.duration
+        requester_id = song.requester_id
+        self.requester_counts[requester_id] = self.requester_counts.get(requester_id, 0) + 1
+
+    def _uncount(self, song):
+        """Take a song out of the running totals"""
+        self.total_duration -= song.counted_duration
+        requester_id = song.requester_id
+        remaining = self.requester_counts.get(requester_id, 0) - 1
+        if remaining > 0:
+            self.requester_counts[requester_id] = remaining
+        else:
+            self.requester_counts.pop(requester_id, None)
+
+    def _changed(self, position):
+        """Record a change that moved or replaced the songs from a position on"""
+        self.version += 1
+        self.changes.append((self.version, position))
+
+    def changed_since(self, version):
+        """
+        First position changed after a version of the queue
+
+        Returns:
+            None if nothing changed, otherwise the lowest position touched
+            (0 when the version is too old to tell)
+        """
+        if version == self.version:
+            return None
+        if not self.changes or self.changes[0][0] > version + 1:
+            return 0
+        return min(position for changed, position in self.changes if changed > version)
+
+    def _set_songs(self, songs, position=0):
+        """Replace the whole queue, keeping the totals (the songs don't change)"""
+        size = self.chunk_size
+        self._chunks = [songs[start:start + size] for start in range(0, len(songs), size)]
+        self._length = len(songs)
+        self._rebuild_tree()
+        self._changed(position)
+
+    # Reading
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def __iter__(self):
+        return chain.from_iterable(self._chunks)
+
+    def __getitem__(self, index):
+        chunk_index, offset = self._locate(self._normalize_index(index))
+        return self._chunks[chunk_index][offset]
+
+    def iter_from(self, start):
+        """Iterate over the songs from a position on, without walking the ones before it"""
+        if start >= self._length:
+            return iter(())
+        chunk_index, offset = self._locate(max(start, 0))
+        return chain(
+            islice(self._chunks[chunk_index], offset, None),
+            chain.from_iterable(islice(self._chunks, chunk_index + 1, None))
+        )
+
+    def slice(self, start, stop):
+        """List of the songs between two positions"""
+        return list(islice(self.iter_from(start), max(stop - start, 0)))
+
+    # Changing
+
+    def insert(self, index, song):
+        """Insert a song before a position (positions past the end append)"""
+        index = min(max(index + self._length if index < 0 else index, 0), self._length)
+        if not self._chunks:
+            self._chunks.append([song])
+            self._rebuild_tree()
+        else:
+            if index == self._length:
+                chunk_index = len(self._chunks) - 1
+                offset = len(self._chunks[chunk_index])
+            else:
+                chunk_index, offset = self._locate(index)
+            chunk = self._chunks[chunk_index]
+            chunk.insert(offset, song)
+
+            if len(chunk) > 2 * self.chunk_size:
+                # Split oversized chunks so inserts stay cheap
+                half = len(chunk) // 2
+                self._chunks[chunk_index:chunk_index + 1] = [chunk[:half], chunk[half:]]
+                self._rebuild_tree()
+            else:
+                self._tree_add(chunk_index, 1)
+
+        self._length += 1
+        self._count(song)
+        self._changed(index)
+
+    def append(self, song):
+        """Add a song to the end of the queue"""
+        self.insert(self._length, song)
+
+    def extend(self, songs):
+        """Add several songs to the end of the queue"""
+        for song in songs:
+            self.append(song)
+
+    def pop(self, index=-1):
+        """Remove and return the song at a position (the last one by default)"""
+        index = self._normalize_index(index)
+        chunk_index, offset = self._locate(index)
+        chunk = self._chunks[chunk_index]
+        song = chunk.pop(offset)
+
+        if chunk:
+            self._tree_add(chunk_index, -1)
+        else:
+            del self._chunks[chunk_index]
+            self._rebuild_tree()
+
+        self._length -= 1
+        self._uncount(song)
+        self._changed(index)
+        return song
+
+    def popleft(self):
+        """Remove and return the first song"""
+        return self.pop(0)
+
+    def move(self, source, destination):
+        """
+        Move the song at one position to another
+
+        Args:
+            source: Current position of the song
+            destination: Position the song ends up at
+
+        Returns:
+            The moved song
+        """
+        destination = self._normalize_index(destination)
+        song = self.pop(source)
+        self.insert(destination, song)
+        return song
+
+    def remove_range(self, start, stop):
+        """
+        Remove the songs between two positions (stop exclusive)
+
+        Returns:
+            List of the removed songs
+        """
+        start = max(start, 0)
+        stop = min(stop, self._length)
+        if start >= stop:
+            return []
+
+        removed = []
+        chunk_index, offset = self._locate(start)
+        remaining = stop - start
+        while remaining:
+            chunk = self._chunks[chunk_index]
+            taken = chunk[offset:offset + remaining]
+            del chunk[offset:offset + remaining]
+            removed.extend(taken)
+            remaining -= len(taken)
+            if chunk:
+                chunk_index += 1
+            else:
+                del self._chunks[chunk_index]
+            offset = 0
+
+        self._length -= len(removed)
+        self._rebuild_tree()
+        for song in removed:
+            self._uncount(song)
+        self._changed(start)
+        return removed
+
+    def shuffle(self, start=0, rng=random):
+        """Shuffle the songs from a position on, O(n)"""
+        songs = list(self)
+        tail = songs[start:]
+        rng.shuffle(tail)
+        songs[start:] = tail
+        self._set_songs(songs, start)
+
+    def clear(self):
+        """Remove every song"""
+        self._chunks = []
+        self._tree = []
+        self._length = 0
+        self.total_duration = 0
+        self.requester_counts = {}
+        self._changed(0)
@@ -0,0 +1,245 @@
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Bitrate (kbps) of cached copies that have to be encoded
+CACHE_BITRATE = 128
+
+class TranscodeCache:
+    """
+    On-disk cache of frequently played YouTube videos, already encoded for voice
+
+    Files are named after the video ID and hold Opus in an Ogg container, so
+    playing one only remuxes it, with no network access and no decoding. A
+    video is copied in the background once it has been played `min_plays`
+    times. The total size is capped, and the least recently played files go
+    first when it's exceeded.
+
+    Shard processes share one folder. Given the shared store, a video is
+    only copied by the process that claims it there. The size cap is
+    enforced on what is actually in the folder, no matter which process
+    copied it, and files copied by another process are picked up the first
+    time they are looked up.
+    """
+
+    def __init__(self, directory, max_bytes, min_plays=3, max_duration=1800,
+                 max_pending=1, max_counted=10000, store=None):
+        """
+        Initialize the cache, picking up the files a previous run left behind
+
+        Args:
+            directory: Folder holding the cached files
+            max_bytes: Total size the cached files may take (0 turns the cache off)
+            min_plays: Plays of a video before it's copied
+            max_duration: Videos longer than this many seconds are never cached
+            max_pending: Copies made at the same time
+            max_counted: Videos whose play counts are remembered
+            store: LocalStore shared with the other shard processes, None when running alone
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self.max_duration = max_duration
+        self.max_pending = max_pending
+        self.max_counted = max_counted
+        self.store = store
+
+        self.files = OrderedDict()  # video id -> size in bytes, least recently played first
+        self.total_bytes = 0
+        self.plays = OrderedDict()  # video id -> play count, least recently played first
+        self.pending = set()  # Video ids being copied right now
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if max_bytes > 0:
+            self._load()
+
+    def _load(self):
+        """Index the files already in the cache folder, oldest first"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan(remove_stale=True)
+        self._evict()
+
+    def _scan(self, remove_stale=False):
+        """
+        Rebuild the index from the files in the cache folder, least recently played first
+
+        Args:
+            remove_stale: Also delete temporary files of copies that were cut short
+        """
+        found = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            name, ext = os.path.splitext(entry.name)
+            if ext == '.tmp':
+                # Another process may still be writing it, only copies older than the longest one are dead
+                if remove_stale and entry.stat().st_mtime < time.time() - self.max_duration - 60:
+                    self._remove(entry.path)
+            elif ext == '.opus':
+                stat = entry.stat()
+                found.append((stat.st_mtime, name, stat.st_size))
+
+        files = OrderedDict((video_id, size) for _, video_id, size in sorted(found))
+        with self._lock:
+            self.files = files
+            self.total_bytes = sum(files.values())
+
+    def path_for(self, video_id):
+        return os.path.join(self.directory, f"{video_id}.opus")
+
+    def lookup(self, video_id):
+        """
+        Get the cached copy of a video (blocking on hits, it touches the file)
+
+        Returns:
+            Path of the Opus file, or None if the video isn't cached
+        """
+        if video_id is None or self.max_bytes <= 0:
+            return None
+        path = self.path_for(video_id)
+        with self._lock:
+            known = video_id in self.files
+        if not known and self.store is not None:
+            # Possibly copied by another shard, files only appear once they are complete
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = None
+            if size is not None:
+                with self._lock:
+                    self.total_bytes += size - self.files.pop(video_id, 0)
+                    self.files[video_id] = size
+                known = True
+
+        with self._lock:
+            if not known:
+                self.misses += 1
+                return None
+            self.files.move_to_end(video_id)
+            self.hits += 1
+        try:
+            # Keeps the least recently played order across restarts
+            os.utime(path)
+        except OSError:
+            # Deleted behind our back
+            with self._lock:
+                self.total_bytes -= self.files.pop(video_id, 0)
+            return None
+        return path
+
+    def record_play(self, video_id, duration=0):
+        """
+        Count a play of a video
+
+        Returns:
+            True if the video should be copied now (call fill() for it)
+        """
+        if video_id is None or self.max_bytes <= 0:
+            return False
+        if duration and duration > self.max_duration:
+            return False
+
+        with self._lock:
+            count = self.plays.pop(video_id, 0) + 1
+            self.plays[video_id] = count
+            while len(self.plays) > self.max_counted:
+                self.plays.popitem(last=False)
+
+            if count < self.min_plays or video_id in self.files or video_id in self.pending:
+                return False
+            if len(self.pending) >= self.max_pending:
+                # Busy, a later play tries again
+                return False
+            self.pending.add(video_id)
+            return True
+
+    def fill(self, video_id, stream_url, codec=None):
+        """
+        Copy a video into the cache with ffmpeg (blocking, run it in an executor)
+
+        Opus streams are only remuxed, anything else is encoded to Opus. The
+        copy is written to a temporary file of its own and renamed into place
+        when it's complete, so a half written file is never played.
+
+        Args:
+            video_id: YouTube video ID
+            stream_url: Working stream URL of the video
+            codec: Audio codec of the stream, as reported by yt-dlp
+
+        Returns:
+            True if the video is cached afterwards
+        """
+        path = self.path_for(video_id)
+        temporary = f"{path}.{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp"
+
+        # With several shards only one of them copies a given video
+        if self.store is not None:
+            if not self.store.claim('transcode_fill', video_id, os.getpid(), self.max_duration):
+                with self._lock:
+                    self.pending.discard(video_id)
+                return False
+            if self.lookup(video_id):
+                # Another shard copied it already
+                self.store.delete('transcode_fill', video_id)
+                with self._lock:
+                    self.pending.discard(video_id)
+                return True
+
+        if codec == 'opus':
+            encode = ['-c:a', 'copy']
+        else:
+            encode = ['-c:a', 'libopus', '-b:a', f'{CACHE_BITRATE}k', '-ar', '48000', '-ac', '2']
+
+        try:
+            subprocess.run(
+                ['ffmpeg', '-nostdin', '-loglevel', 'error', '-y',
+                 '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+                 '-i', stream_url, '-vn', '-map', '0:a:0', *encode, '-f', 'ogg', temporary],
+                check=True, timeout=self.max_duration
+            )
+            size = os.path.getsize(temporary)
+            os.replace(temporary, path)
+        except Exception as e:
+            print(f"Error caching {video_id}: {e}")
+            self._remove(temporary)
+            with self._lock:
+                self.pending.discard(video_id)
+            return False
+        finally:
+            if self.store is not None:
+                self.store.delete('transcode_fill', video_id)
+
+        with self._lock:
+            self.pending.discard(video_id)
+            self.total_bytes += size - self.files.pop(video_id, 0)
+            self.files[video_id] = size
+
+        if self.store is not None:
+            # Other shards fill the folder too, only the folder itself knows the real total
+            self._scan()
+        self._evict()
+        return True
+
+    def _evict(self):
+        """Delete the least recently played files until the cache fits its size again"""
+        while True:
+            with self._lock:
+                if self.total_bytes <= self.max_bytes or not self.files:
+                    return
+                video_id, size = self.files.popitem(last=False)
+                self.total_bytes -= size
+            self._remove(self.path_for(video_id))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Still open on some systems, it's simply no longer indexed
+            print(f"Error removing {path}: {e}")
@@ -1,212 +1,628 @@
-import os
-import yt_dlp
-import multiprocessing
-from multiprocessing import Process, Queue
-
-# Base options for both streaming and downloading
-base_opts = {
-    'format': 'bestaudio/best',
-    'quiet': True,
-    'default_search': 'ytsearch',
-    'noplaylist': True,
-    'cookiefile': '../cookies.txt',
-    'geo_bypass': True,
-    'nocheckcertificate': True,
-    'extractor_retries': 3,
-    'socket_timeout': 15,
-    'http_headers': {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-}
-
-# Streaming-specific options
-stream_opts = {
-    **base_opts,
-    'extract_audio': True,
-    'format': 'bestaudio/best',
-    'postprocessors': [{
-        'key': 'FFmpegExtractAudio',
-        'preferredcodec': 'mp3',
-        'preferredquality': '192',
-    }],
-}
-
-# Download options (used as fallback)
-download_opts = {
-    **base_opts,
-    'format': 'bestaudio/best',
-    'postprocessors': [{
-        'key': 'FFmpegExtractAudio',
-        'preferredcodec': 'mp3',
-        'preferredquality': '192',
-    }],
-    'outtmpl': 'audio/%(title)s.%(ext)s',
-}
-
-def ytdl_process(query, result_queue, mode="stream"):
-    """
-    Process function that runs in a separate process to handle YouTube operations
-    
-    Args:
-        query: YouTube search query or URL
-        result_queue: Queue to store results
-        mode: "stream" or "download"
-    """
-    try:
-        # Select appropriate options
-        opts = stream_opts if mode == "stream" else download_opts
-        
-        # Initialize YoutubeDL with options
-        ydl = yt_dlp.YoutubeDL(opts)
-        
-        # Extract info (and download if mode is download)
-        data = ydl.extract_info(query, download=(mode == "download"))
-        
-        # Handle playlist results
-        if 'entries' in data:
-            data = data['entries'][0]
-        
-        # Prepare result based on mode
-        if mode == "stream":
-            result = {
-                'success': True,
-                'mode': 'stream',
-                'title': data.get('title', 'Unknown'),
-                'url': data.get('url'),
-                'duration': int(data.get('duration', 0)),
-                'thumbnail': data.get('thumbnail'),
-                'webpage_url': data.get('webpage_url')
-            }
-        else:  # download mode
-            # Get the filename that yt-dlp prepared
-            filename = ydl.prepare_filename(data)
-            result = {
-                'success': True,
-                'mode': 'download',
-                'title': data.get('title', 'Unknown'),
-                'filename': filename,
-                'duration': int(data.get('duration', 0)),
-                'thumbnail': data.get('thumbnail'),
-                'webpage_url': data.get('webpage_url')
-            }
-        
-        # Put result in queue
-        result_queue.put(result)
-        
-    except Exception as e:
-        # Handle errors
-        result_queue.put({
-            'success': False,
-            'mode': mode,
-            'error': str(e)
-        })
-
-class YTDLProcessor:
-    """Manager class for YTDL multiprocessing operations"""
-    
-    def __init__(self, max_processes=2):
-        """
-        Initialize with process pool limits
-        
-        Args:
-            max_processes: Maximum number of concurrent YTDL processes
-        """
-        self.max_processes = max_processes
-        self.active_processes = {}
-        self.result_queues = {}
-        
-        # Ensure multiprocessing works properly on all platforms
-        multiprocessing.set_start_method('spawn', force=True)
-    
-    def process_url(self, query_id, query, mode="stream"):
-        """
-        Start processing a YouTube URL or search query in a separate process
-        
-        Args:
-            query_id: Unique identifier for this query (e.g., message ID)
-            query: YouTube search query or URL
-            mode: "stream" or "download"
-            
-        Returns:
-            None (processing happens asynchronously)
-        """
-        # Create result queue for this request
-        result_queue = Queue()
-        self.result_queues[query_id] = result_queue
-        
-        # Prepare search query if needed (not a direct URL)
-        if not query.startswith(('http://', 'https://')):
-            query = f"ytsearch:{query}"
-        
-        # Create and start process
-        process = Process(
-            target=ytdl_process,
-            args=(query, result_queue, mode)
-        )
-        process.daemon = True  # Process will be terminated when main process exits
-        process.start()
-        
-        # Store process reference
-        self.active_processes[query_id] = process
-    
-    def get_result(self, query_id, timeout=None):
-        """
-        Get result for a query, if available
-        
-        Args:
-            query_id: Unique identifier used when starting the process
-            timeout: How long to wait for result (None = wait forever)
-            
-        Returns:
-            Result dict if available, None if timeout or not found
-        """
-        if query_id not in self.result_queues:
-            return None
-            
-        queue = self.result_queues[query_id]
-        
-        try:
-            # Try to get result from queue
-            result = queue.get(block=True, timeout=timeout)
-            
-            # Clean up resources
-            self._cleanup_resources(query_id)
-            
-            return result
-        except Exception:
-            # Timeout or queue error
-            return None
-    
-    def is_processing(self, query_id):
-        """Check if a query is still processing"""
-        if query_id in self.active_processes:
-            process = self.active_processes[query_id]
-            return process.is_alive()
-        return False
-    
-    def _cleanup_resources(self, query_id):
-        """Clean up resources for a completed query"""
-        # Remove queue
-        if query_id in self.result_queues:
-            del self.result_queues[query_id]
-        
-        # Remove process reference
-        if query_id in self.active_processes:
-            del self.active_processes[query_id]
-    
-    def cancel_process(self, query_id):
-        """Cancel a running process"""
-        if query_id in self.active_processes:
-            process = self.active_processes[query_id]
-            if process.is_alive():
-                process.terminate()
-            self._cleanup_resources(query_id)
-            return True
-        return False
-    
-    def cleanup_all(self):
-        """Terminate all active processes and clean up resources"""
-        for query_id, process in list(self.active_processes.items()):
-            if process.is_alive():
-                process.terminate()
-            self._cleanup_resources(query_id)
\ No newline at end of file
+import os
+import multiprocessing
+import threading
+import asyncio
+import uuid
+import queue as queue_module
+from urllib.parse import urlparse, parse_qs
+
+# Base options for both streaming and downloading
+base_opts = {
+    'format': 'bestaudio/best',
+    'quiet': True,
+    'default_search': 'ytsearch',
+    'noplaylist': True,
+    'cookiefile': '../cookies.txt',
+    'geo_bypass': True,
+    'nocheckcertificate': True,
+    'extractor_retries': 3,
+    'socket_timeout': 15,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+}
+
+# Streaming-specific options
+# (Opus streams are preferred since they can be passed to Discord without transcoding)
+stream_opts = {
+    **base_opts,
+    'extract_audio': True,
+    'format': 'bestaudio[acodec=opus]/bestaudio/best',
+    'postprocessors': [{
+        'key': 'FFmpegExtractAudio',
+        'preferredcodec': 'mp3',
+        'preferredquality': '192',
+    }],
+}
+
+# Download options (used as fallback)
+download_opts = {
+    **base_opts,
+    'format': 'bestaudio/best',
+    'postprocessors': [{
+        'key': 'FFmpegExtractAudio',
+        'preferredcodec': 'mp3',
+        'preferredquality': '192',
+    }],
+    'outtmpl': 'audio/%(title)s.%(ext)s',
+}
+
+# Playlist options: only list the entries, each one is resolved later when it nears the head of the queue
+playlist_opts = {
+    **base_opts,
+    'noplaylist': False,
+    'extract_flat': 'in_playlist',
+    'lazy_playlist': True,
+}
+
+# Extractors every worker instantiates up front so the first search doesn't pay for it
+WARM_EXTRACTORS = ('Youtube', 'YoutubeSearch', 'YoutubeTab')
+
+# Playlist entries sent to the bot per message (the first entry is always sent on its own)
+PLAYLIST_BATCH_SIZE = 25
+
+# Longest playlist that is queued, later entries are ignored
+MAX_PLAYLIST_ENTRIES = int(os.getenv('MAX_PLAYLIST_ENTRIES', '1000'))
+
+# Cancelled job numbers the workers remember (older cancels are only dropped by the listener)
+CANCEL_SLOTS = 64
+
+# Placeholder titles YouTube lists for videos that can't be played
+UNAVAILABLE_TITLES = ('[Private video]', '[Deleted video]')
+
+def is_playlist_url(query):
+    """Check if a query is a YouTube playlist link (including videos opened from a playlist)"""
+    if not query.startswith(('http://', 'https://')):
+        return False
+    parsed = urlparse(query)
+    return 'youtu' in parsed.netloc and 'list' in parse_qs(parsed.query)
+
+def ytdl_extract(ydl, query, mode="stream"):
+    """
+    Run a single YouTube lookup with an already constructed YoutubeDL instance
+
+    Args:
+        ydl: YoutubeDL instance configured for the given mode
+        query: YouTube search query or URL
+        mode: "stream" or "download"
+
+    Returns:
+        Result dict describing the track (or the error)
+    """
+    try:
+        # Extract info (and download if mode is download)
+        data = ydl.extract_info(query, download=(mode == "download"))
+
+        # Handle playlist results
+        if 'entries' in data:
+            data = data['entries'][0]
+
+        # Prepare result based on mode
+        if mode == "stream":
+            return {
+                'success': True,
+                'mode': 'stream',
+                'title': data.get('title', 'Unknown'),
+                'url': data.get('url'),
+                'duration': int(data.get('duration', 0)),
+                'thumbnail': data.get('thumbnail'),
+                'webpage_url': data.get('webpage_url'),
+                'acodec': data.get('acodec')
+            }
+        else:  # download mode
+            # Get the filename that yt-dlp prepared
+            filename = ydl.prepare_filename(data)
+            return {
+                'success': True,
+                'mode': 'download',
+                'title': data.get('title', 'Unknown'),
+                'filename': filename,
+                'duration': int(data.get('duration', 0)),
+                'thumbnail': data.get('thumbnail'),
+                'webpage_url': data.get('webpage_url')
+            }
+
+    except Exception as e:
+        # Handle errors
+        return {
+            'success': False,
+            'mode': mode,
+            'error': str(e)
+        }
+
+def flat_entry(entry):
+    """Turn a flat playlist entry into an unresolved stream result (no stream URL yet)"""
+    url = entry.get('webpage_url') or entry.get('url')
+    if not (url or '').startswith(('http://', 'https://')) and entry.get('id'):
+        url = f"https://www.youtube.com/watch?v={entry['id']}"
+
+    thumbnail = entry.get('thumbnail')
+    if not thumbnail and entry.get('thumbnails'):
+        thumbnail = entry['thumbnails'][-1].get('url')
+
+    return {
+        'title': entry.get('title') or 'Unknown',
+        'url': None,
+        'duration': int(entry.get('duration') or 0),
+        'thumbnail': thumbnail,
+        'webpage_url': url,
+        'acodec': None
+    }
+
+def ytdl_playlist(ydl, url, emit, batch_size=PLAYLIST_BATCH_SIZE, max_entries=MAX_PLAYLIST_ENTRIES, cancelled=None):
+    """
+    List a playlist's entries without resolving them, reporting them as they arrive
+
+    The entries are read lazily page by page, so the first one can be queued
+    (and played) long before the whole playlist has been listed.
+
+    Args:
+        ydl: YoutubeDL instance configured with playlist_opts
+        url: Playlist URL
+        emit: Function called with each list of entries
+        batch_size: Entries per emitted list
+        max_entries: Stop after this many entries
+        cancelled: Function returning True once the listing is no longer wanted, checked before each batch
+
+    Returns:
+        Result dict with the playlist title and number of entries (or the error)
+    """
+    try:
+        data = ydl.extract_info(url, download=False, process=False)
+
+        # Links to a video in a playlist redirect to the playlist itself
+        for _ in range(3):
+            if data.get('_type') not in ('url', 'url_transparent'):
+                break
+            data = ydl.extract_info(data['url'], download=False, process=False, ie_key=data.get('ie_key'))
+
+        title = data.get('title', 'Unknown')
+        if data.get('entries') is None:
+            # A single video after all
+            emit([flat_entry(data)])
+            return {'success': True, 'mode': 'playlist', 'title': title, 'count': 1}
+
+        batch = []
+        count = 0
+        for entry in data['entries']:
+            if not entry or entry.get('title') in UNAVAILABLE_TITLES:
+                continue
+            batch.append(flat_entry(entry))
+            count += 1
+
+            # Send the first entry right away so playback can start
+            if count == 1 or len(batch) >= batch_size:
+                if cancelled is not None and cancelled():
+                    return {'success': False, 'mode': 'playlist', 'error': 'Cancelled'}
+                emit(batch)
+                batch = []
+            if count >= max_entries:
+                break
+
+        if batch:
+            emit(batch)
+        return {'success': True, 'mode': 'playlist', 'title': title, 'count': count}
+
+    except Exception as e:
+        return {
+            'success': False,
+            'mode': 'playlist',
+            'error': str(e)
+        }
+
+def ytdl_worker(worker_index, job_queue, result_queue, max_jobs=None, cancelled_jobs=None):
+    """
+    Long-lived worker that runs in a separate process and handles YouTube operations
+
+    The YoutubeDL instances (and the extractors they cache) are created once and
+    reused for every job, so only the first job of a worker pays the import and
+    initialisation cost.
+
+    Args:
+        worker_index: Slot of this worker in the pool
+        job_queue: Queue of (query_id, job_number, query, mode) jobs, None means shut down
+        result_queue: Queue to report (kind, worker_index, query_id, payload) messages,
+                      kind being 'started', 'entries' (playlist jobs), 'result' or 'exiting'
+        max_jobs: Exit after this many jobs so the pool can recycle the process
+        cancelled_jobs: Shared array of recently cancelled job numbers, checked between steps
+    """
+    # Only the workers run yt-dlp, importing it here keeps it out of the bot process
+    import yt_dlp
+
+    ydls = {
+        'stream': yt_dlp.YoutubeDL(stream_opts),
+        'download': yt_dlp.YoutubeDL(download_opts),
+        'playlist': yt_dlp.YoutubeDL(playlist_opts),
+    }
+
+    # Warm up extractor instances before the first request arrives
+    for ydl in ydls.values():
+        for ie_key in WARM_EXTRACTORS:
+            try:
+                ydl.get_info_extractor(ie_key)
+            except Exception:
+                pass
+
+    jobs_done = 0
+    while max_jobs is None or jobs_done < max_jobs:
+        job = job_queue.get()
+        if job is None:
+            break
+
+        query_id, job_number, query, mode = job
+        if cancelled_jobs is not None and job_number in cancelled_jobs[:]:
+            # Cancelled while it was waiting in the queue, only report back so the listener can forget it
+            result_queue.put(('result', worker_index, query_id, {'success': False, 'mode': mode, 'error': 'Cancelled'}))
+            continue
+        result_queue.put(('started', worker_index, query_id, None))
+
+        if mode == "playlist":
+            emit = lambda entries: result_queue.put(('entries', worker_index, query_id, entries))
+            cancelled = (lambda: job_number in cancelled_jobs[:]) if cancelled_jobs is not None else None
+            result = ytdl_playlist(ydls['playlist'], query, emit, cancelled=cancelled)
+        else:
+            ydl = ydls['stream' if mode == "stream" else 'download']
+            result = ytdl_extract(ydl, query, mode)
+        result_queue.put(('result', worker_index, query_id, result))
+        jobs_done += 1
+
+    # Sent after the last result, so the listener only replaces this worker once it has everything from it
+    result_queue.put(('exiting', worker_index, None, os.getpid()))
+
+class YTDLProcessor:
+    """Manager class for a pool of persistent YTDL worker processes"""
+
+    def __init__(self, max_processes=2, max_jobs_per_worker=500):
+        """
+        Initialize with process pool limits
+
+        Args:
+            max_processes: Maximum number of concurrent YTDL processes
+            max_jobs_per_worker: Jobs a worker handles before it is recycled
+        """
+        self.max_processes = max_processes
+        self.max_jobs_per_worker = max_jobs_per_worker
+
+        # Ensure multiprocessing works properly on all platforms
+        self._mp = multiprocessing.get_context('spawn')
+        self.job_queue = None
+        self.result_queue = None
+
+        self.workers = [None] * max_processes  # Worker processes by slot
+        self.running_jobs = {}  # worker slot -> query_id currently being processed
+        self.pending = set()  # query_ids submitted but without a result yet
+        self.results = {}  # query_id -> finished result not yet collected
+        self.futures = {}  # query_id -> (loop, asyncio.Future) awaiting the result
+        self.streams = {}  # query_id -> (loop, asyncio.Queue) receiving playlist entries and the result
+        self.job_numbers = {}  # query_id -> number the workers know the job by
+        self.next_job_number = 1
+        self.cancelled_jobs = None  # Ring of cancelled job numbers shared with the workers
+        self.next_cancel_slot = 0
+
+        # The listener thread and callers share the bookkeeping above
+        self._lock = threading.Condition()
+        self._listener = None
+
+    def start(self):
+        """
+        Start the worker pool so workers are warm before the first request
+
+        Workers that exit later are only replaced by the listener thread, once
+        it has read everything they sent, so their last result is never lost.
+        """
+        with self._lock:
+            if self.job_queue is None:
+                self.job_queue = self._mp.Queue()
+                self.result_queue = self._mp.Queue()
+                self.cancelled_jobs = self._mp.RawArray('q', CANCEL_SLOTS)
+
+            for index, process in enumerate(self.workers):
+                if process is None:
+                    self._spawn_worker(index)
+
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen,
+                    name="ytdl-result-listener",
+                    daemon=True
+                )
+                self._listener.start()
+
+    def _spawn_worker(self, index):
+        """Start a worker process in the given slot (caller holds the lock)"""
+        # A job the previous worker was running is lost with it
+        lost_query_id = self.running_jobs.pop(index, None)
+        if lost_query_id is not None:
+            self._store_result(lost_query_id, {
+                'success': False,
+                'mode': 'stream',
+                'error': 'YTDL worker exited unexpectedly'
+            })
+
+        process = self._mp.Process(
+            target=ytdl_worker,
+            args=(index, self.job_queue, self.result_queue, self.max_jobs_per_worker, self.cancelled_jobs)
+        )
+        process.daemon = True  # Process will be terminated when main process exits
+        process.start()
+        self.workers[index] = process
+
+    def process_url(self, query_id, query, mode="stream"):
+        """
+        Queue a YouTube URL or search query for the worker pool
+
+        Args:
+            query_id: Unique identifier for this query (e.g., message ID)
+            query: YouTube search query or URL
+            mode: "stream" or "download"
+
+        Returns:
+            None (processing happens asynchronously)
+        """
+        # Make sure the pool is running (recycled or crashed workers are replaced by the listener)
+        self.start()
+
+        # Prepare search query if needed (not a direct URL)
+        if not query.startswith(('http://', 'https://')):
+            query = f"ytsearch:{query}"
+
+        with self._lock:
+            self.pending.add(query_id)
+            job_number = self.next_job_number
+            self.next_job_number += 1
+            self.job_numbers[query_id] = job_number
+        self.job_queue.put((query_id, job_number, query, mode))
+
+    def _listen(self):
+        """Listener thread: route worker messages to waiting futures and get_result callers"""
+        while True:
+            try:
+                message = self.result_queue.get(timeout=1.0)
+            except queue_module.Empty:
+                # Quiet period - replace workers that crashed (recycled ones say so with 'exiting')
+                with self._lock:
+                    if self.job_queue is None:
+                        return
+                    crashed = [index for index, process in enumerate(self.workers)
+                               if process is not None and not process.is_alive()]
+                    if crashed:
+                        # A dead worker's messages may have arrived since the timeout, apply them first
+                        self._drain()
+                        for index in crashed:
+                            if not self.workers[index].is_alive():
+                                self._spawn_worker(index)
+                continue
+            except (EOFError, OSError):
+                return
+
+            if message is None:
+                return
+
+            with self._lock:
+                self._handle_message(message)
+
+    def _drain(self):
+        """Apply every message already waiting in the result queue (caller holds the lock)"""
+        while True:
+            try:
+                message = self.result_queue.get_nowait()
+            except (queue_module.Empty, EOFError, OSError):
+                return
+            if message is None:
+                # cleanup_all() is stopping the listener, leave it for the next get()
+                self.result_queue.put(None)
+                return
+            self._handle_message(message)
+
+    def _store_result(self, query_id, result):
+        """Record a finished result unless nobody waits for it anymore (caller holds the lock)"""
+        if query_id not in self.pending:
+            # Cancelled, or started before cleanup_all()
+            return
+        self.pending.discard(query_id)
+        self.job_numbers.pop(query_id, None)
+
+        if query_id in self.streams:
+            loop, stream = self.streams.pop(query_id)
+            loop.call_soon_threadsafe(stream.put_nowait, result)
+        elif query_id in self.futures:
+            loop, future = self.futures.pop(query_id)
+            loop.call_soon_threadsafe(_set_future_result, future, result)
+        else:
+            self.results[query_id] = result
+            self._lock.notify_all()
+
+    def _handle_message(self, message):
+        """Apply one message reported by a worker (caller holds the lock)"""
+        kind, worker_index, query_id, payload = message
+        if kind == 'started':
+            self.running_jobs[worker_index] = query_id
+        elif kind == 'entries':
+            if query_id in self.streams and query_id in self.pending:
+                loop, stream = self.streams[query_id]
+                loop.call_soon_threadsafe(stream.put_nowait, {
+                    'success': True,
+                    'mode': 'playlist',
+                    'entries': payload
+                })
+        elif kind == 'result':
+            if self.running_jobs.get(worker_index) == query_id:
+                del self.running_jobs[worker_index]
+            self._store_result(query_id, payload)
+        elif kind == 'exiting':
+            # Recycled after max_jobs_per_worker, everything it sent has been read by now
+            process = self.workers[worker_index]
+            if self.job_queue is not None and process is not None and process.pid == payload:
+                self._spawn_worker(worker_index)
+
+    def result_future(self, query_id):
+        """
+        Get an asyncio future that completes with the result of a query
+
+        Must be called from the event loop thread. The future is resolved by the
+        listener thread the moment a worker reports back, so awaiting it never
+        blocks the loop.
+
+        Args:
+            query_id: Unique identifier used when starting the process
+
+        Returns:
+            asyncio.Future resolving to the result dict, or None if the query is unknown
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        with self._lock:
+            if query_id in self.results:
+                future.set_result(self.results.pop(query_id))
+            elif query_id in self.pending:
+                self.futures[query_id] = (loop, future)
+            else:
+                return None
+
+        return future
+
+    async def resolve(self, query, mode="stream", timeout=60):
+        """
+        Run a query through the pool and wait for it without blocking the event loop
+
+        Args:
+            query: YouTube search query or URL
+            mode: "stream" or "download"
+            timeout: Seconds to wait before the query is cancelled
+
+        Returns:
+            Result dict (with success False on errors and timeouts)
+        """
+        query_id = str(uuid.uuid4())
+        self.process_url(query_id, query, mode)
+
+        future = self.result_future(query_id)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.cancel_process(query_id)
+            return {'success': False, 'mode': mode, 'error': f'Timed out after {timeout} seconds'}
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # Cancelled through cancel_process
+                return {'success': False, 'mode': mode, 'error': 'Cancelled'}
+            self.cancel_process(query_id)
+            raise
+
+    async def stream_playlist(self, url, timeout=60):
+        """
+        List a playlist through the pool, yielding its entries as the worker reports them
+
+        Entries come without stream URLs, they are resolved one by one when they
+        are about to play. Closing the generator early cancels the listing, the
+        worker stops before sending its next batch and takes the next job.
+
+        Args:
+            url: Playlist URL
+            timeout: Seconds to wait for the next batch before giving up
+
+        Yields:
+            Dicts with success True and the next 'entries', then the final result
+            (with the playlist 'title' and 'count', or success False and the 'error')
+        """
+        query_id = str(uuid.uuid4())
+        stream = asyncio.Queue()
+        with self._lock:
+            self.streams[query_id] = (asyncio.get_running_loop(), stream)
+        self.process_url(query_id, url, mode="playlist")
+
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(stream.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    yield {'success': False, 'mode': 'playlist', 'error': f'Timed out after {timeout} seconds'}
+                    return
+
+                yield message
+                if 'entries' not in message:
+                    return
+        finally:
+            with self._lock:
+                self.streams.pop(query_id, None)
+            self.cancel_process(query_id)
+
+    def get_result(self, query_id, timeout=None):
+        """
+        Get result for a query, if available (blocking, for use outside the event loop)
+
+        Args:
+            query_id: Unique identifier used when starting the process
+            timeout: How long to wait for result (None = wait forever)
+
+        Returns:
+            Result dict if available, None if timeout or not found
+        """
+        with self._lock:
+            if query_id not in self.results and query_id not in self.pending:
+                return None
+
+            self._lock.wait_for(lambda: query_id in self.results or query_id not in self.pending, timeout)
+            return self.results.pop(query_id, None)
+
+    def is_processing(self, query_id):
+        """Check if a query is still processing"""
+        return query_id in self.pending
+
+    def cancel_process(self, query_id):
+        """
+        Cancel a queued or running query
+
+        Workers are never killed for this: they share the job and result queues,
+        and a worker killed while writing to one would leave it broken for the
+        whole pool. A queued job is skipped, a running playlist listing stops
+        before its next batch, and a running lookup finishes but its result is
+        dropped.
+        """
+        with self._lock:
+            if query_id not in self.pending:
+                return False
+
+            self.pending.discard(query_id)
+            job_number = self.job_numbers.pop(query_id, None)
+            if job_number is not None and self.cancelled_jobs is not None:
+                self.cancelled_jobs[self.next_cancel_slot] = job_number
+                self.next_cancel_slot = (self.next_cancel_slot + 1) % CANCEL_SLOTS
+
+            if query_id in self.futures:
+                loop, future = self.futures.pop(query_id)
+                loop.call_soon_threadsafe(future.cancel)
+            if query_id in self.streams:
+                loop, stream = self.streams.pop(query_id)
+                loop.call_soon_threadsafe(stream.put_nowait, {'success': False, 'mode': 'playlist', 'error': 'Cancelled'})
+            return True
+
+    def cleanup_all(self):
+        """Terminate all worker processes and clean up resources"""
+        with self._lock:
+            for index, process in enumerate(self.workers):
+                if process is not None and process.is_alive():
+                    process.terminate()
+                self.workers[index] = None
+
+            for loop, future in self.futures.values():
+                loop.call_soon_threadsafe(future.cancel)
+
+            # Wake up and stop the listener thread
+            if self.result_queue is not None:
+                self.result_queue.put(None)
+            self.job_queue = None
+
+            self.running_jobs.clear()
+            self.pending.clear()
+            self.results.clear()
+            self.futures.clear()
+            self.streams.clear()
+            self.job_numbers.clear()
+            self._lock.notify_all()
+
+def _set_future_result(future, result):
+    """Resolve a future on its own loop, ignoring futures that were cancelled meanwhile"""
+    if not future.done():
+        future.set_result(result)
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+def shard_settings():
+    """
+    Read the shard configuration of this process from the environment
+
+    Returns:
+        Tuple of (shard count, list of shard ids this process runs),
+        (None, None) when the bot isn't sharded
+    """
+    shard_count = os.getenv('SHARD_COUNT')
+    if not shard_count:
+        return None, None
+    shard_ids = os.getenv('SHARD_IDS')
+    if shard_ids:
+        return int(shard_count), [int(shard_id) for shard_id in shard_ids.split(',')]
+    return int(shard_count), list(range(int(shard_count)))
+
+def plan_shards(shard_count, processes):
+    """Spread shard ids over processes round-robin, e.g. 5 shards on 2 processes: [0, 2, 4], [1, 3]"""
+    processes = max(1, min(processes, shard_count))
+    return [list(range(first, shard_count, processes)) for first in range(processes)]
+
+def run_shards(script, shard_count, processes=None, restart_delay=5):
+    """
+    Run the bot as several processes, each connecting its own subset of shards
+
+    Children get SHARD_COUNT and SHARD_IDS in their environment and are
+    restarted if they crash. Returns once every process exited cleanly,
+    Ctrl+C stops them all.
+
+    Args:
+        script: Path of the bot script to start for every process
+        shard_count: Total number of shards
+        processes: Number of processes (defaults to one per shard, at most one per core)
+        restart_delay: Seconds to wait before restarting a crashed process
+    """
+    if processes is None:
+        processes = min(shard_count, os.cpu_count() or 1)
+    plan = plan_shards(shard_count, processes)
+
+    def start(shard_ids):
+        env = dict(os.environ, SHARD_COUNT=str(shard_count), SHARD_IDS=",".join(map(str, shard_ids)))
+        print(f"Starting shard process for shards {shard_ids}")
+        return subprocess.Popen([sys.executable, script], env=env)
+
+    children = [start(shard_ids) for shard_ids in plan]
+    try:
+        while any(child.poll() is None for child in children):
+            time.sleep(1)
+            for index, child in enumerate(children):
+                code = child.poll()
+                if code:
+                    print(f"Shard process for shards {plan[index]} exited with code {code}, restarting in {restart_delay}s")
+                    time.sleep(restart_delay)
+                    children[index] = start(plan[index])
+    except KeyboardInterrupt:
+        print("Stopping shard processes...")
+    finally:
+        for child in children:
+            if child.poll() is None:
+                child.send_signal(signal.SIGINT)
+        for child in children:
+            try:
+                child.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                child.kill()
+
+def shard_key(bot):
+    """Store key of this process's shards, e.g. '0,2,4' ('0' when not sharded)"""
+    shard_ids = getattr(bot, 'shard_ids', None)
+    return ",".join(map(str, shard_ids)) if shard_ids else "0"
+
+async def report_shard_stats(bot, store, players, interval=60):
+    """Background task publishing this process's numbers to the shared store"""
+    loop = asyncio.get_running_loop()
+    while True:
+        stats = {
+            'guilds': len(bot.guilds),
+            'voice': len(bot.voice_clients),
+            'playing': sum(1 for player in players.values() if player.is_playing),
+            'queued': sum(len(player.queue) for player in players.values()),
+            'latency': round(bot.latency * 1000) if bot.latency == bot.latency else None  # NaN before the first heartbeat
+        }
+        try:
+            await loop.run_in_executor(None, store.put, 'shards', shard_key(bot), stats)
+        except Exception as e:
+            print(f"Error saving shard stats: {e}")
+        await asyncio.sleep(interval)
+
+def total_stats(store, max_age=180):
+    """Sum the numbers recently reported by every shard process"""
+    totals = {'processes': 0, 'guilds': 0, 'voice': 0, 'playing': 0, 'queued': 0}
+    for stats in store.items('shards', max_age=max_age).values():
+        totals['processes'] += 1
+        for name in ('guilds', 'voice', 'playing', 'queued'):
+            totals[name] += stats.get(name, 0)
+    return totals
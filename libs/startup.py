@@ -0,0 +1,102 @@
+import sys
+import time
+
+# Modules that only belong in worker processes or behind a first use, flagged if the bot process loads them at startup
+DEFERRED_MODULES = ('yt_dlp', 'mutagen')
+
+class ImportTimer:
+    """
+    Measures how long every module imported during startup takes, like `python -X importtime`
+
+    While installed it sits first in sys.meta_path, lets the regular finders
+    find each module and wraps the loader's exec_module to time it. Times
+    are "self" times, the imports a module does itself are counted for
+    those modules instead.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.self_times = {}  # module name -> seconds spent executing it, its own imports excluded
+        self.total = 0.0  # Seconds spent importing, all modules together
+        self._stack = []  # Time spent in nested imports of the modules currently executing
+        self._finding = False
+        self.deferred_loaded = []  # DEFERRED_MODULES that were imported anyway
+
+    def install(self):
+        """Start timing imports"""
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        """Stop timing imports, once the startup imports are done"""
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+        self.deferred_loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+
+    def find_spec(self, fullname, path=None, target=None):
+        """Find the module with the other finders and time its loader"""
+        if self._finding:
+            return None
+
+        self._finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding = False
+
+        # Built-in and frozen modules share one loader class, those are quick anyway
+        loader = spec.loader
+        if loader is None or isinstance(loader, type) or not hasattr(loader, 'exec_module'):
+            return spec
+
+        exec_module = loader.exec_module
+        def timed_exec_module(module):
+            self._stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - started
+                nested = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += elapsed
+                else:
+                    self.total += elapsed
+                self.self_times[fullname] = elapsed - nested
+
+        loader.exec_module = timed_exec_module
+        return spec
+
+    def by_package(self):
+        """Import time summed per top level package, slowest first"""
+        packages = {}
+        for name, seconds in self.self_times.items():
+            package = name.partition('.')[0]
+            packages[package] = packages.get(package, 0.0) + seconds
+        return sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+    def report(self, ready_at=None, limit=8, budget=None):
+        """
+        Print where startup time went
+
+        Args:
+            ready_at: perf_counter() when the bot got ready, to report the time to ready
+            limit: Number of packages to list
+            budget: Seconds of imports allowed before warning about it
+        """
+        print(f"Startup imports took {self.total * 1000:.0f} ms:")
+        for package, seconds in self.by_package()[:limit]:
+            print(f"  {package:<24} {seconds * 1000:7.1f} ms")
+        if ready_at is not None:
+            print(f"Ready {ready_at - self.started:.2f}s after startup")
+
+        if budget is not None and self.total > budget:
+            print(f"⚠️ Startup imports took longer than the {budget * 1000:.0f} ms budget")
+        for name in self.deferred_loaded:
+            print(f"⚠️ {name} was imported at startup, it should only load when it's needed")
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite file shared by every bot process on this machine
+STORE_PATH = os.getenv('BREADBOT_STORE', 'breadbot.db')
+
+class LocalStore:
+    """
+    Small JSON key/value store in SQLite, safe to share between processes
+
+    Shard processes use it for state that has to be seen by all of them,
+    like the help message and per-shard stats. WAL mode lets readers run
+    alongside a writer, and writers from other processes wait for each other.
+    """
+
+    def __init__(self, path=STORE_PATH, timeout=5.0):
+        """
+        Open (and create if needed) the store
+
+        Args:
+            path: SQLite file
+            timeout: Seconds to wait for another process's write to finish
+        """
+        self.path = path
+        self.db = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self.db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key, default=None):
+        """Get a value, or default if it isn't set"""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def put(self, namespace, key, value):
+        """Set a value (anything JSON serializable)"""
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, updated) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), time.time())
+            )
+            self.db.commit()
+
+    def claim(self, namespace, key, value, max_age):
+        """
+        Set a value unless another process set it less than max_age seconds ago
+
+        Setting and checking happen in one statement, so of several processes
+        claiming the same key at once exactly one gets it. Delete the key to
+        give the claim up early.
+
+        Returns:
+            True if this call set the value
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self.db.execute(
+                "INSERT INTO kv (namespace, key, value, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, updated = excluded.updated "
+                "WHERE kv.updated < ?",
+                (namespace, key, json.dumps(value), now, now - max_age)
+            )
+            self.db.commit()
+        return cursor.rowcount == 1
+
+    def delete(self, namespace, key):
+        """Remove a value"""
+        with self._lock:
+            self.db.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+            self.db.commit()
+
+    def items(self, namespace, max_age=None):
+        """
+        Get every value in a namespace
+
+        Args:
+            namespace: Namespace to read
+            max_age: Skip values not updated in this many seconds
+
+        Returns:
+            Dict of key -> value
+        """
+        query = "SELECT key, value FROM kv WHERE namespace = ?"
+        params = [namespace]
+        if max_age is not None:
+            query += " AND updated >= ?"
+            params.append(time.time() - max_age)
+        with self._lock:
+            rows = self.db.execute(query, params).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+def content_hash(value):
+    """Stable hash of anything JSON serializable, to tell whether it changed since it was stored"""
+    data = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+_store = None
+
+def get_store():
+    """Get the process wide store, opening it on first use"""
+    global _store
+    if _store is None:
+        _store = LocalStore()
+    return _store
@@ -0,0 +1,164 @@
+import json
+import os
+import time
+from collections import deque
+
+# Responses used when no TRIGGERS_FILE is configured
+DEFAULT_TRIGGERS = {
+    'bread': 'Did someone say bread? 🍞'
+}
+
+class TriggerMatcher:
+    """
+    Aho-Corasick automaton finding any of a set of words in one pass over a message
+
+    The cost of a scan depends on the length of the message, not on how many
+    trigger words there are. Matching is case-insensitive and, like the old
+    `'bread' in content` check, also matches inside longer words.
+    """
+
+    def __init__(self, words):
+        """
+        Compile the words into the automaton
+
+        Args:
+            words: Trigger words, earlier words win when several end at the same spot
+        """
+        self.words = [word.lower() for word in words if word]
+        self.goto = [{}]  # state -> {character: next state}
+        self.fail = [0]  # state -> longest proper suffix state
+        self.output = [None]  # state -> index of the word matched when reaching it
+
+        # Trie of all words
+        for index, word in enumerate(self.words):
+            state = 0
+            for char in word:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                    self.goto[state][char] = next_state
+                state = next_state
+            if self.output[state] is None:
+                self.output[state] = index
+
+        # Failure links, breadth first so shorter suffixes are done first
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self.goto[state].items():
+                pending.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.output[next_state] is None:
+                    # A word ending here as a suffix counts too
+                    self.output[next_state] = self.output[self.fail[next_state]]
+
+    def search(self, text):
+        """
+        Find the first trigger word in a text
+
+        Returns:
+            Index of the matched word, None if there's none
+        """
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+class TriggerEngine:
+    """
+    Auto-responses to trigger words, throttled so they never crowd out command replies
+
+    Each channel gets at most one response per cooldown, and all channels
+    share a small budget of responses per second. Messages that are
+    commands or come from bots are not scanned at all.
+    """
+
+    def __init__(self, triggers, prefix='-', cooldown=15.0, responses_per_second=5.0):
+        """
+        Initialize the engine
+
+        Args:
+            triggers: Dict of trigger word -> response
+            prefix: Command prefix, messages starting with it are left to the commands
+            cooldown: Seconds between two responses in the same channel
+            responses_per_second: Responses allowed per second over all channels
+        """
+        self.matcher = TriggerMatcher(triggers.keys())
+        self.responses = [triggers[word] for word in triggers if word]
+        self.prefix = prefix
+        self.cooldown = cooldown
+        self.responses_per_second = responses_per_second
+
+        self.quiet_until = {}  # channel id -> time the channel may get a response again
+        self.tokens = responses_per_second
+        self.refilled_at = time.monotonic()
+        self.matched = 0
+        self.throttled = 0
+
+    def respond(self, message):
+        """
+        Get the response to a message, if it should get one right now
+
+        Returns:
+            Response text, or None
+        """
+        if message.author.bot or message.content.startswith(self.prefix):
+            return None
+
+        index = self.matcher.search(message.content)
+        if index is None:
+            return None
+        self.matched += 1
+
+        now = time.monotonic()
+        channel_id = message.channel.id
+        if self.quiet_until.get(channel_id, 0) > now:
+            self.throttled += 1
+            return None
+
+        # Shared budget, refilled continuously
+        self.tokens = min(self.tokens + (now - self.refilled_at) * self.responses_per_second, self.responses_per_second)
+        self.refilled_at = now
+        if self.tokens < 1:
+            self.throttled += 1
+            return None
+        self.tokens -= 1
+
+        if len(self.quiet_until) > 10000:
+            # Forget channels whose cooldown is over
+            self.quiet_until = {channel: until for channel, until in self.quiet_until.items() if until > now}
+        self.quiet_until[channel_id] = now + self.cooldown
+        return self.responses[index]
+
+def load_triggers(path=None):
+    """
+    Read the trigger words and responses from a JSON file ({"word": "response", ...})
+
+    Args:
+        path: JSON file, defaults to TRIGGERS_FILE
+
+    Returns:
+        Dict of trigger word -> response (DEFAULT_TRIGGERS when there's no file)
+    """
+    path = path or os.getenv('TRIGGERS_FILE')
+    if not path:
+        return dict(DEFAULT_TRIGGERS)
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Error loading triggers from {path}: {e}")
+        return dict(DEFAULT_TRIGGERS)
@@ -0,0 +1,36 @@
+import discord
+from discord.ext import commands
+from libs.music.core import players
+from libs.music.guild_lock import guild_locks
+
+def setup(bot):
+    """Setup the move command"""
+    @bot.command(name='move')
+    @guild_locks.serialized
+    async def move(ctx, source: int = None, destination: int = None):
+        """Move a song to another position in the queue"""
+        if ctx.guild.id not in players or not players[ctx.guild.id].queue:
+            await ctx.send("The queue is empty!")
+            return
+
+        player = players[ctx.guild.id]
+        queue_length = len(player.queue)
+
+        if source is None or destination is None:
+            await ctx.send("Please specify the song's position and where to move it, e.g. `-move 5 1`.")
+            return
+
+        # Check if both positions are valid
+        if not (1 <= source <= queue_length and 1 <= destination <= queue_length):
+            await ctx.send(f"Invalid position! Please specify numbers between 1 and {queue_length}.")
+            return
+
+        # Move the song (convert positions to 0-based indexes)
+        song = player.move_song(source - 1, destination - 1)
+
+        embed = discord.Embed(
+            title="↕️ Moved",
+            description=f"**{song.name}** moved from position {source} to {destination}",
+            color=0x89CFF0
+        )
+        await ctx.send(embed=embed)
@@ -1,9 +1,18 @@
-from discord.ext import commands
-
-def setup(bot):
-    """Setup the ping command"""
-    @bot.command(name='ping')
-    async def ping(ctx):
-        """Check bot's latency"""
-        latency = round(bot.latency * 1000)
-        await ctx.send(f'Pong! Latency: {latency}ms')
\ No newline at end of file
+from discord.ext import commands
+from libs.sharding import total_stats
+from libs.store import get_store
+
+def setup(bot):
+    """Setup the ping command"""
+    @bot.command(name='ping')
+    async def ping(ctx):
+        """Check bot's latency"""
+        latency = round(bot.latency * 1000)
+        message = f'Pong! Latency: {latency}ms'
+
+        # When sharded, say which shard answered and how big the whole bot is
+        if bot.shard_count and bot.shard_count > 1:
+            totals = total_stats(get_store())
+            message += f" (shard {ctx.guild.shard_id} of {bot.shard_count}, {totals['guilds']} servers across {totals['processes']} processes)"
+
+        await ctx.send(message)
\ No newline at end of file
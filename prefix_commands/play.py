@@ -1,392 +1,989 @@
-import discord
-from discord.ext import commands
-import os
-import asyncio
-from functools import partial
-import uuid
-from libs.music.core import MusicPlayer, Song, StreamSong, players
-from libs.music.ytdl_processor import YTDLProcessor
-
-# Create a global YTDLProcessor instance with 2 max processes
-ytdl_processor = YTDLProcessor(max_processes=2)
-
-class YTDLSource(discord.PCMVolumeTransformer):
-    def __init__(self, source, *, data, volume=0.5):
-        super().__init__(source, volume)
-        self.title = data.get('title', 'Unknown')
-        self.url = data.get('url')
-        self.duration = int(data.get('duration', 0))
-        self.thumbnail = data.get('thumbnail')
-        self.webpage_url = data.get('webpage_url')
-        self.filename = data.get('filename')  # For downloaded files
-
-async def check_ytdl_result(ctx, query_id, status_message, query):
-    """
-    Check for YTDL process results periodically and update status message
-    Returns the YTDLSource when complete or None if failed
-    """
-    # Set timeout counter (max 60 seconds)
-    timeout_counter = 0
-    max_timeout = 60
-    
-    while timeout_counter < max_timeout:
-        # Check if result is available
-        result = ytdl_processor.get_result(query_id, timeout=0.5)
-        
-        if result is not None:
-            # Process completed
-            if result['success']:
-                # Success - create appropriate audio source
-                if result['mode'] == 'stream':
-                    # Update status message
-                    embed = discord.Embed(
-                        title="✅ Found!",
-                        description=f"Playing: **{result['title']}**",
-                        color=0x89CFF0
-                    )
-                    if result.get('thumbnail'):
-                        embed.set_thumbnail(url=result['thumbnail'])
-                    await status_message.edit(embed=embed)
-                    
-                    # Create source for streaming
-                    source = discord.FFmpegPCMAudio(result['url'])
-                    ytdl_source = YTDLSource(source, data=result, volume=0.5)
-                    return ytdl_source, True
-                else:
-                    # Downloaded file
-                    embed = discord.Embed(
-                        title="✅ Downloaded!",
-                        description=f"Playing: **{result['title']}**",
-                        color=0x89CFF0
-                    )
-                    if result.get('thumbnail'):
-                        embed.set_thumbnail(url=result['thumbnail'])
-                    await status_message.edit(embed=embed)
-                    
-                    # Get the final filename after post-processing
-                    base_filename = os.path.splitext(result['filename'])[0]
-                    # Try common extensions (.mp3 first since that's our preferred format)
-                    for ext in ['.mp3', '.m4a', '.webm', '.opus']:
-                        test_filename = f"{base_filename}{ext}"
-                        if os.path.exists(test_filename):
-                            source = discord.FFmpegPCMAudio(test_filename)
-                            result['filename'] = test_filename  # Update with actual file
-                            ytdl_source = YTDLSource(source, data=result, volume=0.5)
-                            return ytdl_source, False
-                    
-                    # If we can't find the processed file, report error
-                    await status_message.edit(content="❌ Could not find processed audio file.", embed=None)
-                    return None, None
-            else:
-                # Error occurred
-                await status_message.edit(content=f"❌ Error: {result['error']}", embed=None)
-                return None, None
-        
-        # No result yet, update status message every 5 seconds
-        if timeout_counter % 5 == 0 and timeout_counter > 0:
-            embed = discord.Embed(
-                title="🔍 Still searching...",
-                description=f"Looking for: **{query}** ({timeout_counter}s)",
-                color=0x89CFF0
-            )
-            await status_message.edit(embed=embed)
-        
-        # Increment timeout counter
-        timeout_counter += 1
-        
-        # Short sleep to avoid busy waiting
-        await asyncio.sleep(1)
-    
-    # Timed out
-    ytdl_processor.cancel_process(query_id)
-    await status_message.edit(content="❌ Search timed out after 60 seconds.", embed=None)
-    return None, None
-
-async def update_progress(ctx, player, message):
-    """Update the progress bar every 10 seconds"""
-    while player.is_playing and player.current_song:
-        try:
-            # Create updated embed
-            embed = discord.Embed(
-                title="🎵 Now Playing",
-                description=f"**{player.current_song.name}**",
-                color=0x89CFF0
-            )
-            
-            # Add progress bar
-            position = player.get_current_position()
-            duration = player.current_song.duration
-            progress_bar = player.create_progress_bar()
-            
-            time_format = lambda s: f"{int(s/60):02d}:{int(s%60):02d}"
-            progress_text = f"\n{time_format(position)} {progress_bar} {time_format(duration)}"
-            
-            embed.add_field(
-                name="Progress",
-                value=progress_text,
-                inline=False
-            )
-            
-            embed.add_field(
-                name="Requested by",
-                value=player.current_song.requester.display_name,
-                inline=True
-            )
-
-            if hasattr(player.current_song, 'thumbnail'):
-                embed.set_thumbnail(url=player.current_song.thumbnail)
-            elif player.current_song.requester.avatar:
-                embed.set_thumbnail(url=player.current_song.requester.avatar.url)
-            
-            await message.edit(embed=embed)
-            
-            # Wait 10 seconds before next update
-            await asyncio.sleep(10)
-            
-        except discord.NotFound:
-            # Message was deleted
-            break
-        except Exception as e:
-            print(f"Error updating progress: {e}")
-            break
-
-def after_song_callback(error, ctx, bot):
-    """Callback that runs after a song finishes"""
-    if error:
-        print(f'Player error: {error}')
-        return
-
-    # Use create_task to schedule play_next in the event loop
-    bot.loop.create_task(play_next(ctx, bot))
-
-async def play_next(ctx, bot):
-    """Play the next song in the queue"""
-    player = players[ctx.guild.id]
-    
-    if not player.queue:
-        player.is_playing = False
-        player.current_song = None
-        return
-
-    # Get next song and play it
-    next_song = player.get_next_song()
-    player.current_song = next_song
-    player.is_playing = True
-
-    # Check if it's a streaming source or local file
-    if hasattr(next_song, 'stream_url'):
-        audio_source = discord.FFmpegPCMAudio(next_song.stream_url)
-    else:
-        audio_source = discord.FFmpegPCMAudio(next_song.full_path)
-    
-    # Create "Now Playing" embed
-    embed = discord.Embed(
-        title="🎵 Now Playing",
-        description=f"**{next_song.name}**",
-        color=0x89CFF0
-    )
-    # Add initial progress bar
-    progress_text = f"\n00:00 ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ {next_song.formatted_duration}"
-    embed.add_field(
-        name="Progress",
-        value=progress_text,
-        inline=False
-    )
-    embed.add_field(
-        name="Requested by",
-        value=next_song.requester.display_name,
-        inline=True
-    )
-    embed.add_field(
-        name="Duration",
-        value=next_song.formatted_duration,
-        inline=True
-    )
-    if hasattr(next_song, 'thumbnail'):
-        embed.set_thumbnail(url=next_song.thumbnail)
-    elif next_song.requester.avatar:
-        embed.set_thumbnail(url=next_song.requester.avatar.url)
-    
-    # Send embed and start progress updates
-    now_playing_message = await ctx.send(embed=embed)
-    player.start_playback()
-    
-    # Start progress update task
-    update_task = bot.loop.create_task(update_progress(ctx, player, now_playing_message))
-    player.current_update_task = update_task
-    
-    # Use functools.partial to pass additional arguments to the callback
-    from functools import partial
-    callback = partial(after_song_callback, ctx=ctx, bot=bot)
-    
-    ctx.voice_client.play(audio_source, after=callback)
-
-def setup(bot):
-    """Setup the play command"""
-    @bot.command(name='play')
-    async def play(ctx, *, query: str):
-        """Play an audio file or YouTube video in the user's voice channel"""
-        if ctx.guild.id not in players:
-            players[ctx.guild.id] = MusicPlayer()
-        
-        player = players[ctx.guild.id]
-
-        # Check if the user is in a voice channel
-        if not ctx.author.voice:
-            await ctx.send("You need to be in a voice channel to use this command!")
-            return
-            
-        # Get the voice channel
-        voice_channel = ctx.author.voice.channel
-        
-        # First, check if it's a local file
-        audio_extensions = ['.mp3', '.wav', '.ogg', '.m4a']
-        
-        # Try to find the file with any supported extension
-        full_path = None
-        actual_filename = None
-        is_local = False
-        
-        for ext in audio_extensions:
-            test_path = f"audio/{query}{ext}"
-            if os.path.exists(test_path):
-                full_path = test_path
-                actual_filename = f"{query}{ext}"
-                is_local = True
-                break
-        
-        # If not a local file, try streaming from YouTube
-        if not is_local:
-            # Show searching status
-            status_embed = discord.Embed(
-                title="🔍 Searching...",
-                description=f"Looking for: **{query}**",
-                color=0x89CFF0
-            )
-            status_message = await ctx.send(embed=status_embed)
-            
-            # Generate a unique ID for this request
-            query_id = str(uuid.uuid4())
-            
-            # Start the YTDL process in a separate process
-            ytdl_processor.process_url(query_id, query, mode="stream")
-            
-            # Wait for result (non-blocking)
-            source, is_stream = await check_ytdl_result(ctx, query_id, status_message, query)
-            
-            if not source:
-                return  # Error message already shown by check_ytdl_result
-            
-            # Create StreamSong from YTDLSource
-            song = StreamSong(source, ctx.author)
-        else:
-            # Use regular Song class for local files
-            song = Song(actual_filename, full_path, ctx.author)
-
-        try:
-            voice_client_connected = False
-
-            # Connect to voice channel if not already connected
-            if ctx.voice_client is None:
-                await voice_channel.connect()
-                voice_client_connected = True
-            elif ctx.voice_client.channel != voice_channel:
-                await ctx.voice_client.move_to(voice_channel)
-                voice_client_connected = True
-
-            # Add delay after connecting to allow voice connection to stabilize
-            if voice_client_connected:
-                await asyncio.sleep(1.5)  # Give the voice connection time to establish
-            
-            # Verify connection is still active
-            if not ctx.voice_client or not ctx.voice_client.is_connected():
-                await ctx.send("❌ Failed to establish voice connection. Please try again.")
-                return
-
-            if not player.is_playing:
-                player.current_song = song
-                player.is_playing = True
-                
-                # Use appropriate audio source
-                if is_local:
-                    audio_source = discord.FFmpegPCMAudio(full_path)
-                else:
-                    audio_source = discord.FFmpegPCMAudio(song.stream_url)
-                
-                # Create "Now Playing" embed
-                embed = discord.Embed(
-                    title="🎵 Now Playing",
-                    description=f"**{song.name}**",
-                    color=0x89CFF0
-                )
-                # Add initial progress bar
-                progress_text = f"\n00:00 ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ {song.formatted_duration}"
-                embed.add_field(
-                    name="Progress",
-                    value=progress_text,
-                    inline=False
-                )
-                embed.add_field(
-                    name="Requested by",
-                    value=song.requester.display_name,
-                    inline=True
-                )
-                embed.add_field(
-                    name="Duration",
-                    value=song.formatted_duration,
-                    inline=True
-                )
-                
-                if hasattr(song, 'thumbnail'):
-                    embed.set_thumbnail(url=song.thumbnail)
-                elif song.requester.avatar:
-                    embed.set_thumbnail(url=song.requester.avatar.url)
-                
-                # Send embed and start progress updates
-                now_playing_message = await ctx.send(embed=embed)
-                player.start_playback()
-                
-                # Start progress update task
-                update_task = bot.loop.create_task(update_progress(ctx, player, now_playing_message))
-                player.current_update_task = update_task
-                
-                # Use functools.partial to pass additional arguments to the callback
-                from functools import partial
-                callback = partial(after_song_callback, ctx=ctx, bot=bot)
-                
-                ctx.voice_client.play(audio_source, after=callback)
-            else:
-                # Add to queue
-                player.add_to_queue(song)
-                
-                # Create "Added to Queue" embed
-                embed = discord.Embed(
-                    title="📝 Added to Queue",
-                    description=f"**{song.name}**",
-                    color=0xFFD700  # Secondary color (gold) for queue messages
-                )
-                embed.add_field(
-                    name="Requested by",
-                    value=song.requester.display_name,
-                    inline=True
-                )
-                embed.add_field(
-                    name="Duration",
-                    value=song.formatted_duration,
-                    inline=True
-                )
-                embed.add_field(
-                    name="Position in queue",
-                    value=len(player.queue),
-                    inline=True
-                )
-
-                if hasattr(song, 'thumbnail'):
-                    embed.set_thumbnail(url=song.thumbnail)
-                elif song.requester.avatar:
-                    embed.set_thumbnail(url=song.requester.avatar.url)
-                
-                await ctx.send(embed=embed)
-            
-        except Exception as e:
-            await ctx.send(f"An error occurred: {str(e)}")
\ No newline at end of file
+import discord
+from discord.ext import commands
+import os
+import asyncio
+from functools import partial
+from itertools import islice
+import uuid
+import time
+from libs.music.core import Song, StreamSong, get_player, players
+from libs.music.ytdl_processor import YTDLProcessor, is_playlist_url
+from libs.music.resolve_cache import ResolutionCache, youtube_video_id
+from libs.music.transcode_cache import TranscodeCache
+from libs.music.loudness import LoudnessAnalyzer
+from libs.music.lookahead import keep_queue_warm
+from libs.music.audio import build_audio_source, FrameCountingSource, PrebufferedSource
+from libs.music.library import AudioLibrary
+from libs.music.probe import DurationProber
+from libs.music.progress import ProgressScheduler
+from libs.music.idle import VoiceIdleManager
+from libs.music.snapshot import PlayerSnapshots
+from libs.music.guild_lock import guild_locks
+from libs.store import STORE_PATH, get_store
+
+# Create a global YTDLProcessor instance with 2 max processes
+ytdl_processor = YTDLProcessor(max_processes=2)
+
+# Cache of resolved tracks so repeat requests skip yt-dlp entirely
+# (shard processes share theirs through the local store unless YTDL_CACHE_DB says otherwise)
+resolve_cache = ResolutionCache(
+    max_entries=int(os.getenv('YTDL_CACHE_SIZE', '2000')),
+    db_path=os.getenv('YTDL_CACHE_DB') or (STORE_PATH if os.getenv('SHARD_COUNT') else None)
+)
+
+# Local Opus copies of the most played videos, served from disk instead of YouTube
+# (created in setup(), the YTDL workers and the shard launcher import this module too and must not touch the folder)
+transcode_cache = None
+
+# Measures how loud upcoming tracks are so they can all be played at the same level (an empty target turns it off).
+# Local files are re-encoded anyway, so their gain is free. A stream that gets a gain is re-encoded instead of
+# passing its Opus audio through, so streams are only normalized with LOUDNESS_SOURCES=all (from their cached copy)
+LOUDNESS_TARGET = os.getenv('LOUDNESS_TARGET', '-14')
+LOUDNESS_SOURCES = os.getenv('LOUDNESS_SOURCES', 'local').lower()
+loudness_analyzer = LoudnessAnalyzer(
+    target=float(LOUDNESS_TARGET or 0),
+    tolerance=float(os.getenv('LOUDNESS_TOLERANCE', '2')),
+    db_path=os.getenv('LOUDNESS_DB') or (STORE_PATH if os.getenv('SHARD_COUNT') else None)
+) if LOUDNESS_TARGET else None
+
+# Probes local file durations off the event loop, remembering them per (path, size, mtime)
+# (kept in the local store across restarts unless AUDIO_PROBE_DB says otherwise)
+duration_prober = DurationProber(db_path=os.getenv('AUDIO_PROBE_DB') or STORE_PATH)
+
+# Index of the local audio folder, kept up to date in the background
+audio_library = AudioLibrary('audio', probe_duration=duration_prober.probe)
+
+# Number of upcoming queue entries kept resolved ahead of time
+LOOKAHEAD_DEPTH = int(os.getenv('LOOKAHEAD_DEPTH', '3'))
+
+# Seconds a stream URL must stay valid after its song ends when playback starts
+PLAY_URL_MARGIN = 30
+
+# Seconds before the end of a song that the next song's source is pre-opened
+PRELOAD_LEAD = float(os.getenv('PRELOAD_LEAD', '5'))
+
+# A song whose source ends more than this many seconds before its end died and is resumed where it stopped
+EARLY_END_MARGIN = 5
+
+# Times a song is resumed before giving up on it
+MAX_RESUME_ATTEMPTS = 3
+
+# Longest queue a guild can build, keeps memory per guild bounded
+MAX_QUEUE_LENGTH = int(os.getenv('MAX_QUEUE_LENGTH', '10000'))
+
+# Seconds a player may sit unused (nothing playing, not in voice) before it's dropped
+PLAYER_IDLE_TIMEOUT = float(os.getenv('PLAYER_IDLE_TIMEOUT', '900'))
+eviction_task = None
+
+# Snapshots of every guild's player so restarts don't lose the queues (an empty path turns them off)
+PLAYER_SNAPSHOT_PATH = os.getenv('PLAYER_SNAPSHOT_PATH', 'player_state.jsonl')
+if PLAYER_SNAPSHOT_PATH and os.getenv('SHARD_IDS'):
+    # Every shard process keeps its own file (the same --shards/--processes split restores the same guilds)
+    root, ext = os.path.splitext(PLAYER_SNAPSHOT_PATH)
+    PLAYER_SNAPSHOT_PATH = f"{root}.shards-{os.getenv('SHARD_IDS').replace(',', '-')}{ext}"
+PLAYER_SNAPSHOT_INTERVAL = float(os.getenv('PLAYER_SNAPSHOT_INTERVAL', '30'))
+player_snapshots = PlayerSnapshots(PLAYER_SNAPSHOT_PATH) if PLAYER_SNAPSHOT_PATH else None
+snapshot_task = None
+
+async def check_ytdl_result(ctx, query_id, status_message, query):
+    """
+    Wait for the YTDL result without blocking the event loop and update status message
+    Returns the result dict when complete or None if failed
+
+    No audio source is opened here, that happens when the song actually plays
+    """
+    # Max 60 seconds, with a status update every 5 seconds
+    timeout_counter = 0
+    max_timeout = 60
+    status_interval = 5
+
+    result_future = ytdl_processor.result_future(query_id)
+    
+    while result_future is not None and timeout_counter < max_timeout:
+        try:
+            # Wakes up the moment the worker reports back
+            result = await asyncio.wait_for(asyncio.shield(result_future), timeout=status_interval)
+        except asyncio.TimeoutError:
+            result = None
+        except asyncio.CancelledError:
+            if not result_future.cancelled():
+                raise
+            # The query was cancelled elsewhere
+            break
+        
+        if result is not None:
+            # Process completed
+            if result['success']:
+                if result['mode'] == 'stream':
+                    # Remember the track for the next time someone asks for it
+                    resolve_cache.put(query, result)
+
+                    # Update status message
+                    embed = discord.Embed(
+                        title="✅ Found!",
+                        description=f"Playing: **{result['title']}**",
+                        color=0x89CFF0
+                    )
+                    if result.get('thumbnail'):
+                        embed.set_thumbnail(url=result['thumbnail'])
+                    await status_message.edit(embed=embed)
+                    return result, True
+                else:
+                    # Downloaded file
+                    embed = discord.Embed(
+                        title="✅ Downloaded!",
+                        description=f"Playing: **{result['title']}**",
+                        color=0x89CFF0
+                    )
+                    if result.get('thumbnail'):
+                        embed.set_thumbnail(url=result['thumbnail'])
+                    await status_message.edit(embed=embed)
+                    
+                    # Get the final filename after post-processing
+                    base_filename = os.path.splitext(result['filename'])[0]
+                    # Try common extensions (.mp3 first since that's our preferred format)
+                    for ext in ['.mp3', '.m4a', '.webm', '.opus']:
+                        test_filename = f"{base_filename}{ext}"
+                        if os.path.exists(test_filename):
+                            result['filename'] = test_filename  # Update with actual file
+                            return result, False
+                    
+                    # If we can't find the processed file, report error
+                    await status_message.edit(content="❌ Could not find processed audio file.", embed=None)
+                    return None, None
+            else:
+                # Error occurred
+                await status_message.edit(content=f"❌ Error: {result['error']}", embed=None)
+                return None, None
+        
+        # No result yet, update status message every 5 seconds
+        timeout_counter += status_interval
+        if timeout_counter < max_timeout:
+            embed = discord.Embed(
+                title="🔍 Still searching...",
+                description=f"Looking for: **{query}** ({timeout_counter}s)",
+                color=0x89CFF0
+            )
+            await status_message.edit(embed=embed)
+    
+    # Timed out
+    ytdl_processor.cancel_process(query_id)
+    await status_message.edit(content="❌ Search timed out after 60 seconds.", embed=None)
+    return None, None
+
+def build_progress_embed(player):
+    """Build the Now Playing embed with the current progress bar"""
+    embed = discord.Embed(
+        title="🎵 Now Playing",
+        description=f"**{player.current_song.name}**",
+        color=0x89CFF0
+    )
+    
+    # Add progress bar
+    position = player.get_current_position()
+    duration = player.current_song.duration
+    progress_bar = player.create_progress_bar()
+    
+    time_format = lambda s: f"{int(s/60):02d}:{int(s%60):02d}"
+    progress_text = f"\n{time_format(position)} {progress_bar} {time_format(duration)}"
+    
+    embed.add_field(
+        name="Progress",
+        value=progress_text,
+        inline=False
+    )
+    
+    embed.add_field(
+        name="Requested by",
+        value=player.current_song.requester_name,
+        inline=True
+    )
+
+    if hasattr(player.current_song, 'thumbnail'):
+        embed.set_thumbnail(url=player.current_song.thumbnail)
+    elif player.current_song.requester_avatar:
+        embed.set_thumbnail(url=player.current_song.requester_avatar)
+    
+    return embed
+
+# One scheduler keeps every guild's Now Playing message up to date within a shared edit budget
+progress_scheduler = ProgressScheduler(
+    build_progress_embed,
+    edits_per_second=float(os.getenv('PROGRESS_EDITS_PER_SECOND', '2'))
+)
+
+async def refresh_song(song, margin=PLAY_URL_MARGIN):
+    """
+    Re-resolve a StreamSong's stream URL in place
+    Returns True if the song has a usable stream URL afterwards
+    """
+    if not song.webpage_url:
+        return False
+
+    # Another guild may have resolved the same video recently
+    if resolve_cache.needs_load(song.webpage_url):
+        cached = await asyncio.get_running_loop().run_in_executor(None, resolve_cache.get, song.webpage_url)
+    else:
+        cached = resolve_cache.get(song.webpage_url)
+    if cached and cached['url'] and cached['url'] != song.stream_url:
+        song.refresh(cached)
+        if not song.needs_refresh(margin):
+            return True
+
+    result = await ytdl_processor.resolve(song.webpage_url)
+    if not result['success']:
+        print(f"Error resolving {song.name}: {result['error']}")
+        return False
+
+    resolve_cache.put(song.webpage_url, result)
+    song.refresh(result)
+    return True
+
+async def cached_copy(song):
+    """Path of the local copy of a StreamSong in the transcode cache, None if there's none"""
+    if transcode_cache is None or not hasattr(song, 'stream_url'):
+        return None
+    video_id = youtube_video_id(song.webpage_url)
+    if video_id not in transcode_cache.files and transcode_cache.store is None:
+        # A miss that never touches the disk
+        return transcode_cache.lookup(video_id)
+    # Hits touch the file (and shards check for copies made by the others), keep that off the loop
+    return await asyncio.get_running_loop().run_in_executor(None, transcode_cache.lookup, video_id)
+
+async def warm_song(song, margin=PLAY_URL_MARGIN):
+    """Lookahead refresh that leaves songs served from the transcode cache alone"""
+    if transcode_cache is not None and youtube_video_id(song.webpage_url) in transcode_cache.files:
+        return True
+    return await refresh_song(song, margin)
+
+def cache_if_popular(bot, song):
+    """Count a play of a stream and copy it into the transcode cache once it's played often enough"""
+    video_id = youtube_video_id(song.webpage_url)
+    if transcode_cache is not None and transcode_cache.record_play(video_id, song.duration):
+        bot.loop.run_in_executor(None, transcode_cache.fill, video_id, song.stream_url, song.codec)
+
+def track_key(song):
+    """Key a song's loudness is remembered under: its video ID, or its file path"""
+    if hasattr(song, 'stream_url'):
+        return youtube_video_id(song.webpage_url) or song.webpage_url
+    return song.full_path
+
+def set_song_gain(song):
+    """Fix the loudness gain a song is played with (for all its sources, seeks included)"""
+    if loudness_analyzer is not None and (LOUDNESS_SOURCES == 'all' or not hasattr(song, 'stream_url')):
+        song.gain = loudness_analyzer.gain_for(track_key(song))
+
+def analyze_upcoming(player):
+    """Measure the loudness of the current and next few songs in the background"""
+    if loudness_analyzer is None:
+        return
+    songs = [player.current_song] if player.current_song else []
+    songs += islice(player.queue, LOOKAHEAD_DEPTH)
+    for song in songs:
+        if hasattr(song, 'stream_url'):
+            # Only measured from the local copy, streams aren't downloaded a second time just for this
+            # (a stream without one simply plays untouched)
+            video_id = youtube_video_id(song.webpage_url)
+            if LOUDNESS_SOURCES != 'all' or transcode_cache is None or video_id not in transcode_cache.files:
+                continue
+            location = transcode_cache.path_for(video_id)
+        else:
+            location = song.full_path
+        if track_key(song):
+            loudness_analyzer.schedule(track_key(song), location)
+
+def ensure_lookahead(bot, player):
+    """Start the background task that keeps upcoming queue entries resolved"""
+    if player.lookahead_task is None or player.lookahead_task.done():
+        player.lookahead_task = bot.loop.create_task(
+            keep_queue_warm(player, warm_song, depth=LOOKAHEAD_DEPTH)
+        )
+
+def open_prebuffered(song, cached_path=None, start=0):
+    """Open a song's source and read its first frames (blocking)"""
+    source = PrebufferedSource(build_audio_source(song, cached_path=cached_path, start=start))
+    source.prebuffer()
+    return source
+
+def cleanup_opened(future):
+    """Done callback closing a source nobody is going to play"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().cleanup()
+
+async def preload_next(player, song):
+    """Pre-open and pre-buffer the next song's source shortly before the current song ends"""
+    # Songs of unknown length can't be timed, they switch over the regular way
+    if not song.duration:
+        return
+
+    # Re-check now and then since pausing pushes the end of the song back
+    while True:
+        if player.current_song is not song:
+            return
+        remaining = song.duration - player.get_current_position()
+        if remaining <= PRELOAD_LEAD:
+            break
+        await asyncio.sleep(min(remaining - PRELOAD_LEAD, 5))
+
+    if not player.queue:
+        return
+    next_song = player.queue[0]
+
+    cached_path = await cached_copy(next_song)
+    if cached_path is None and hasattr(next_song, 'stream_url') and next_song.needs_refresh(PLAY_URL_MARGIN):
+        if not await refresh_song(next_song):
+            return
+
+    # Spawning ffmpeg and waiting for its first frames both block, keep them off the loop
+    set_song_gain(next_song)
+    loop = asyncio.get_running_loop()
+    opening = loop.run_in_executor(None, open_prebuffered, next_song, cached_path, next_song.resume_position)
+    try:
+        source = await asyncio.shield(opening)
+    except asyncio.CancelledError:
+        # The song was skipped or stopped, close the source once the thread is done opening it
+        opening.add_done_callback(cleanup_opened)
+        raise
+
+    # The current song may have ended while the source was opening
+    if player.current_song is not song:
+        source.cleanup()
+        return
+
+    player.set_preloaded(next_song, source)
+
+def after_song_callback(error, ctx, bot, source):
+    """Callback that runs after a song finishes, source being the FrameCountingSource it played from"""
+    if error:
+        # Still move on, otherwise the player would stay "playing" with nothing to play
+        print(f'Player error: {error}')
+
+    # Remember when the song ended to measure the gap before the next one starts
+    player = players.get(ctx.guild.id)
+    resume_at = None
+    if player:
+        player.song_ended_at = time.perf_counter()
+
+        # Reads slower than a frame are audible stutters
+        song = player.current_song
+        if source.slow_reads and song:
+            print(f"{song.name} in {ctx.guild.name}: {source.slow_reads} slow reads "
+                  f"in {source.frames} frames, longest {source.longest_read * 1000:.0f} ms")
+
+        # The source ran out well before the end of the song (not -skip or -stop): the stream died
+        if ((source.finished or error) and song and song.duration
+                and source.position < song.duration - EARLY_END_MARGIN
+                and player.resume_attempts < MAX_RESUME_ATTEMPTS):
+            resume_at = source.position
+
+    # This runs on the voice thread, hand the rest over to the event loop
+    asyncio.run_coroutine_threadsafe(advance(ctx, bot, source, resume_at), bot.loop)
+
+async def advance(ctx, bot, ended_source, resume_at=None):
+    """
+    Move on from a source that ended, in line with the guild's commands
+
+    Args:
+        ctx: Context of the guild
+        bot: The bot
+        ended_source: The FrameCountingSource that ended
+        resume_at: Position to resume the song at if its stream died, None to play the next song
+    """
+    async with guild_locks.hold(ctx.guild.id, bounded=False):
+        player = players.get(ctx.guild.id)
+        if player is not None and player.playing_source is not ended_source:
+            # A command already started something new (a -play after a -stop), don't skip over it
+            return
+
+        if resume_at is not None:
+            await resume_song(ctx, bot, resume_at)
+        else:
+            await play_next(ctx, bot)
+
+async def resume_song(ctx, bot, position):
+    """Continue the current song from where its source ended too early"""
+    player = players.get(ctx.guild.id)
+    song = player.current_song if player else None
+    if song is None or not ctx.voice_client:
+        await play_next(ctx, bot)
+        return
+
+    player.resume_attempts += 1
+    print(f"{song.name} in {ctx.guild.name} stopped at {position:.0f}s, resuming")
+
+    # Try the same URL first since reopening it is quickest, re-resolve if that didn't help
+    cached_path = await cached_copy(song)
+    if cached_path is None and hasattr(song, 'stream_url') and (player.resume_attempts > 1 or song.needs_refresh(0)):
+        if not await refresh_song(song, 0):
+            await play_next(ctx, bot)
+            return
+
+    audio_source = await bot.loop.run_in_executor(
+        None, partial(build_audio_source, song, cached_path=cached_path, start=position)
+    )
+    if not ctx.voice_client or player.current_song is not song:
+        # Stopped or moved on in the meantime
+        audio_source.cleanup()
+        return
+
+    counted_source = FrameCountingSource(audio_source, offset=position)
+    ctx.voice_client.play(counted_source, after=partial(after_song_callback, ctx=ctx, bot=bot, source=counted_source))
+    player.playing_source = counted_source
+
+async def seek_current(ctx, bot, position):
+    """
+    Jump to a position in the current song by swapping in a source that starts there
+
+    Args:
+        ctx: Context of the guild
+        bot: The bot
+        position: Seconds into the song
+
+    Returns:
+        True if playback continues from the new position
+    """
+    player = players.get(ctx.guild.id)
+    song = player.current_song if player else None
+    if song is None:
+        return False
+
+    cached_path = await cached_copy(song)
+    if cached_path is None and hasattr(song, 'stream_url') and song.needs_refresh(0):
+        if not await refresh_song(song, 0):
+            return False
+
+    # Open and pre-buffer the new source first so the switch is seamless
+    source = await bot.loop.run_in_executor(None, open_prebuffered, song, cached_path, position)
+
+    voice_client = ctx.voice_client
+    if (voice_client is None or player.current_song is not song or player.playing_source is None
+            or not (voice_client.is_playing() or voice_client.is_paused())):
+        source.cleanup()
+        return False
+
+    # The voice client keeps playing the same FrameCountingSource (a paused song stays paused),
+    # so the after callback bound to it still knows which source ended
+    old_source = player.playing_source.replace(source, position)
+
+    # Give the voice thread a moment to finish a read of the old source before closing it
+    await asyncio.sleep(0.5)
+    await bot.loop.run_in_executor(None, old_source.cleanup)
+    return True
+
+def unloadable_message(names, limit=5):
+    """Message about songs that were skipped because they couldn't be loaded"""
+    if len(names) == 1:
+        return f"❌ Could not load **{names[0]}**, skipping."
+    listed = ", ".join(f"**{name}**" for name in names[:limit])
+    if len(names) > limit:
+        listed += f" and {len(names) - limit} more"
+    return f"❌ Could not load {len(names)} songs, skipped {listed}."
+
+async def play_next(ctx, bot):
+    """Play the next song in the queue (hold the guild's lock while calling this)"""
+    player = players.get(ctx.guild.id)
+    if player is None:
+        # Evicted in the meantime
+        return
+
+    # Progress updates and preloading belong to the song that just ended
+    player.cancel_song_tasks()
+
+    # Songs that failed to load on the way to one that plays, reported in a single message
+    failed = []
+    audio_source = None
+    while audio_source is None:
+        if not ctx.voice_client or not player.queue:
+            # Disconnected (by -stop or the idle manager, the queue is left alone) or nothing left to play
+            player.is_playing = False
+            player.current_song = None
+            player.discard_preloaded()
+            player.touch()
+            if failed:
+                await ctx.send(unloadable_message(failed))
+            return
+
+        # Get next song and play it
+        next_song = player.get_next_song()
+        player.current_song = next_song
+        player.is_playing = True
+        player.resume_attempts = 0
+
+        # Songs restored after a restart or a disconnect continue where they were
+        start = next_song.resume_position
+        next_song.resume_position = 0
+
+        # Use the source pre-opened near the end of the last song, or open one now
+        audio_source = player.take_preloaded(next_song)
+        if audio_source is None:
+            # Popular streams play from the transcode cache, without touching YouTube
+            cached_path = await cached_copy(next_song)
+
+            # Make sure the stream URL is still valid (normally the lookahead already did this)
+            if cached_path is None and hasattr(next_song, 'stream_url') and next_song.needs_refresh(PLAY_URL_MARGIN):
+                if not await refresh_song(next_song):
+                    failed.append(next_song.name)
+                    continue
+
+            set_song_gain(next_song)
+            audio_source = await bot.loop.run_in_executor(
+                None, partial(build_audio_source, next_song, cached_path=cached_path, start=start)
+            )
+
+    if not ctx.voice_client:
+        # Disconnected in the meantime
+        audio_source.cleanup()
+        player.is_playing = False
+        player.current_song = None
+        player.touch()
+        return
+
+    # Start the audio before anything else so the channel is silent as briefly as possible
+    counted_source = FrameCountingSource(audio_source, offset=start)
+    callback = partial(after_song_callback, ctx=ctx, bot=bot, source=counted_source)
+    ctx.voice_client.play(counted_source, after=callback)
+    player.start_playback(counted_source)
+
+    if player.song_ended_at is not None:
+        player.last_gap = time.perf_counter() - player.song_ended_at
+        player.song_ended_at = None
+        print(f"Transition gap in {ctx.guild.name}: {player.last_gap * 1000:.0f} ms")
+
+    player.preload_task = bot.loop.create_task(preload_next(player, next_song))
+
+    if hasattr(next_song, 'stream_url') and not next_song.needs_refresh():
+        cache_if_popular(bot, next_song)
+
+    # Measure what's coming up while this song plays
+    analyze_upcoming(player)
+
+    if failed:
+        await ctx.send(unloadable_message(failed))
+    
+    # Create "Now Playing" embed
+    embed = discord.Embed(
+        title="🎵 Now Playing",
+        description=f"**{next_song.name}**",
+        color=0x89CFF0
+    )
+    # Add initial progress bar
+    progress_text = f"\n00:00 ▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬ {next_song.formatted_duration}"
+    embed.add_field(
+        name="Progress",
+        value=progress_text,
+        inline=False
+    )
+    embed.add_field(
+        name="Requested by",
+        value=next_song.requester_name,
+        inline=True
+    )
+    embed.add_field(
+        name="Duration",
+        value=next_song.formatted_duration,
+        inline=True
+    )
+    if hasattr(next_song, 'thumbnail'):
+        embed.set_thumbnail(url=next_song.thumbnail)
+    elif next_song.requester_avatar:
+        embed.set_thumbnail(url=next_song.requester_avatar)
+    
+    # Send embed and hand it to the progress scheduler
+    player.progress_message = await ctx.send(embed=embed)
+    progress_scheduler.register(player)
+
+async def connect_voice(ctx, voice_channel):
+    """
+    Connect to (or move to) the user's voice channel
+    Returns True if the bot is connected afterwards
+    """
+    voice_client_connected = False
+
+    # Connect to voice channel if not already connected
+    if ctx.voice_client is None:
+        await voice_channel.connect()
+        voice_client_connected = True
+    elif ctx.voice_client.channel != voice_channel:
+        await ctx.voice_client.move_to(voice_channel)
+        voice_client_connected = True
+
+    # Add delay after connecting to allow voice connection to stabilize
+    if voice_client_connected:
+        await asyncio.sleep(1.5)  # Give the voice connection time to establish
+    
+    # Verify connection is still active
+    if not ctx.voice_client or not ctx.voice_client.is_connected():
+        await ctx.send("❌ Failed to establish voice connection. Please try again.")
+        return False
+
+    # Remember where the player lives so a restart can bring it back
+    player = players.get(ctx.guild.id)
+    if player:
+        player.text_channel_id = ctx.channel.id
+        player.voice_channel_id = voice_channel.id
+    return True
+
+async def queue_playlist(ctx, bot, url, voice_channel):
+    """
+    Queue a YouTube playlist, starting playback as soon as its first entry is listed
+
+    Entries are queued without stream URLs, play_next and the lookahead resolve
+    them one by one as they near the head of the queue. Only called by -play,
+    which already counts as in progress for the guild.
+    """
+    status_embed = discord.Embed(
+        title="📃 Loading playlist...",
+        description=f"Looking for: **{url}**",
+        color=0x89CFF0
+    )
+    status_message = await ctx.send(embed=status_embed)
+
+    added = 0
+    batches = ytdl_processor.stream_playlist(url)
+    try:
+        async for message in batches:
+            if not message['success']:
+                if added:
+                    await status_message.edit(content=f"❌ Stopped loading the playlist after {added} songs: {message['error']}", embed=None)
+                else:
+                    await status_message.edit(content=f"❌ Error: {message['error']}", embed=None)
+                return
+
+            if 'entries' not in message:
+                # Listing finished
+                embed = discord.Embed(
+                    title="📃 Playlist Queued",
+                    description=f"Added **{added}** songs from **{message['title']}**",
+                    color=0x89CFF0
+                )
+                await status_message.edit(embed=embed)
+                return
+
+            # Each batch is queued in one go, other commands get their turn between batches
+            async with guild_locks.hold(ctx.guild.id, reserved=True):
+                # Fetched again each time, the player may have been evicted while the playlist was listed
+                player = get_player(ctx.guild.id)
+                if added == 0 and not await connect_voice(ctx, voice_channel):
+                    return
+                if not ctx.voice_client:
+                    # Stopped while the playlist was loading
+                    return
+
+                # Only take what still fits in the queue
+                entries = message['entries'][:max(MAX_QUEUE_LENGTH - len(player.queue), 0)]
+                for entry in entries:
+                    player.add_to_queue(StreamSong.from_result(entry, ctx.author))
+                added += len(entries)
+
+                if not player.is_playing:
+                    await play_next(ctx, bot)
+                else:
+                    ensure_lookahead(bot, player)
+
+            if len(entries) < len(message['entries']):
+                await status_message.edit(content=f"⚠️ The queue is full, added the first {added} songs of the playlist.", embed=None)
+                return
+    finally:
+        # Stops the listing if we returned early
+        await batches.aclose()
+
+class ChannelContext:
+    """Just enough of commands.Context for play_next when playback resumes without a command"""
+
+    def __init__(self, guild, channel):
+        self.guild = guild
+        self.channel = channel
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+async def snapshot_players(bot):
+    """Background task appending changed player state to the snapshot file"""
+    while True:
+        await asyncio.sleep(PLAYER_SNAPSHOT_INTERVAL)
+        try:
+            lines = player_snapshots.collect(players)
+            if lines:
+                await bot.loop.run_in_executor(None, player_snapshots.write, lines)
+        except Exception as e:
+            print(f"Error saving player snapshot: {e}")
+
+async def resume_player(bot, guild, player):
+    """Rejoin a restored player's voice channel and continue its queue, if anyone is still listening"""
+    voice_channel = guild.get_channel(player.voice_channel_id) if player.voice_channel_id else None
+    text_channel = guild.get_channel(player.text_channel_id) if player.text_channel_id else None
+    if voice_channel is None or text_channel is None:
+        return
+    if not any(not member.bot for member in voice_channel.members):
+        # Nobody to play to, the queue waits for the next -play
+        return
+
+    try:
+        ctx = ChannelContext(guild, text_channel)
+        async with guild_locks.hold(guild.id, bounded=False):
+            if await connect_voice(ctx, voice_channel) and not player.is_playing:
+                await play_next(ctx, bot)
+    except Exception as e:
+        print(f"Error resuming playback in {guild.name}: {e}")
+
+async def restore_players(bot):
+    """
+    Bring back the players saved before the last restart and start taking snapshots
+
+    Only the saved records are read, no track is resolved: streams are resolved
+    again by play_next and the lookahead as they come up, so even thousands of
+    queued songs restore in well under a second.
+    """
+    global snapshot_task
+    if player_snapshots is None or snapshot_task is not None:
+        return
+
+    started = time.perf_counter()
+    saved = await bot.loop.run_in_executor(None, player_snapshots.load)
+
+    restored = []
+    for guild_id, records in saved.items():
+        guild = bot.get_guild(guild_id)
+        if guild is None or guild_id in players:
+            continue
+        player = player_snapshots.restore(records, guild.get_member)
+        if player is not None:
+            players[guild_id] = player
+            restored.append((guild, player))
+
+    if restored:
+        songs = sum(len(player.queue) for _, player in restored)
+        print(f"Restored {len(restored)} player(s) with {songs} songs in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    snapshot_task = bot.loop.create_task(snapshot_players(bot))
+    for guild, player in restored:
+        bot.loop.create_task(resume_player(bot, guild, player))
+
+def evict_player(guild_id):
+    """Drop a guild's player along with the tasks and sources still attached to it"""
+    player = players.pop(guild_id, None)
+    if player is None:
+        return
+    player.release()
+    progress_scheduler.unregister(player)
+
+async def evict_idle_players(bot, interval=60):
+    """Background task dropping players that haven't been used for PLAYER_IDLE_TIMEOUT seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        for guild_id, player in list(players.items()):
+            guild = bot.get_guild(guild_id)
+            if guild is not None and guild.voice_client is not None:
+                # Still connected, the player is in use
+                continue
+            if guild_locks.pending.get(guild_id):
+                # A command is working with the player right now
+                continue
+            if player.restored and player.queue:
+                # Restored with nobody listening yet, the queue waits for the next -play
+                continue
+            if player.idle_for() >= PLAYER_IDLE_TIMEOUT:
+                evict_player(guild_id)
+
+def start_player_eviction(bot):
+    """Start dropping idle players (only once, on_ready can fire again after reconnects)"""
+    global eviction_task
+    if eviction_task is None:
+        eviction_task = bot.loop.create_task(evict_idle_players(bot))
+
+async def leave_idle_voice(guild, reason):
+    """Disconnect from a guild's voice channel and stop everything its player still runs"""
+    async with guild_locks.hold(guild.id, bounded=False):
+        if reason == 'silence' and guild.voice_client is not None and guild.voice_client.is_playing():
+            # A command queued before this one started the music again
+            return
+
+        player = players.get(guild.id)
+        if player is not None:
+            player.release()
+            progress_scheduler.unregister(player)
+
+            # A paused song goes back to the front of the queue so the next -play picks it up again
+            if player.current_song is not None:
+                song = player.current_song
+                song.resume_position = player.get_current_position()
+                player.queue.insert(0, song)
+                player.queue_changed.set()
+
+            player.current_song = None
+            player.is_playing = False
+            player.is_paused = False
+            player.touch()
+
+        if guild.voice_client is not None:
+            # Stops the ffmpeg process of the current source too
+            await guild.voice_client.disconnect()
+
+    text_channel = guild.get_channel(player.text_channel_id) if player and player.text_channel_id else None
+    if text_channel is not None:
+        if reason == 'alone':
+            description = "Everyone left the voice channel, so I left too. Use `-play` to start again."
+        else:
+            description = "Nothing has played for a while, so I left the voice channel. Use `-play` to start again."
+        embed = discord.Embed(
+            title="👋 Left Voice Channel",
+            description=description,
+            color=0x89CFF0
+        )
+        await text_channel.send(embed=embed)
+
+# Leaves voice channels that went quiet or lost all their listeners
+voice_idle_manager = VoiceIdleManager(
+    leave_idle_voice,
+    silence_timeout=float(os.getenv('VOICE_IDLE_TIMEOUT', '300')),
+    alone_timeout=float(os.getenv('VOICE_ALONE_TIMEOUT', '60'))
+)
+
+def setup(bot):
+    """Setup the play command"""
+    global transcode_cache
+    # Shards share the cache folder and coordinate copying through the local store
+    transcode_cache = TranscodeCache(
+        os.getenv('TRANSCODE_CACHE_DIR', 'transcode_cache'),
+        max_bytes=int(float(os.getenv('TRANSCODE_CACHE_MB', '1024')) * 1024 * 1024),
+        min_plays=int(os.getenv('TRANSCODE_CACHE_MIN_PLAYS', '3')),
+        store=get_store() if os.getenv('SHARD_COUNT') else None
+    )
+
+    # Spawn the YTDL workers now so they are warm before the first -play
+    ytdl_processor.start()
+
+    # Index the local audio folder without holding up startup
+    audio_library.start_watching(interval=int(os.getenv('AUDIO_LIBRARY_SCAN_INTERVAL', '30')))
+
+    @bot.command(name='play')
+    @guild_locks.counted
+    async def play(ctx, *, query: str):
+        """Play an audio file or YouTube video in the user's voice channel"""
+        # Check if the user is in a voice channel
+        if not ctx.author.voice:
+            await ctx.send("You need to be in a voice channel to use this command!")
+            return
+            
+        # Get the voice channel
+        voice_channel = ctx.author.voice.channel
+
+        # Playlists are queued entry by entry while they are being listed
+        if is_playlist_url(query):
+            try:
+                await queue_playlist(ctx, bot, query, voice_channel)
+            except Exception as e:
+                await ctx.send(f"An error occurred: {str(e)}")
+            return
+        
+        # First, check if it's a local file (exact or prefix match from the index,
+        # fuzzy matching is slower and runs off the loop)
+        entry = None
+        if not query.startswith(('http://', 'https://')):
+            entry = audio_library.find(query, fuzzy=False)
+            if entry is None and not audio_library.ready.is_set():
+                # The first scan is still running, an exact filename can be checked directly
+                entry = audio_library.find_file(query)
+            if entry is None and audio_library.entries:
+                entry = await bot.loop.run_in_executor(None, audio_library.find, query)
+        is_local = entry is not None
+        
+        # If not a local file, try the resolution cache before streaming from YouTube
+        # (the shared SQLite file is only read off the loop, a busy shard must not stall it)
+        cached = None
+        if not is_local and resolve_cache.needs_load(query):
+            cached = await bot.loop.run_in_executor(None, resolve_cache.get, query)
+        elif not is_local:
+            cached = resolve_cache.get(query)
+        
+        if cached and cached['url']:
+            # Cache hit with a fresh stream URL - no search needed
+            song = StreamSong.from_result(cached, ctx.author)
+        elif not is_local:
+            # Show searching status
+            status_embed = discord.Embed(
+                title="🔍 Searching...",
+                description=f"Looking for: **{query}**",
+                color=0x89CFF0
+            )
+            status_message = await ctx.send(embed=status_embed)
+            
+            # Generate a unique ID for this request
+            query_id = str(uuid.uuid4())
+            
+            # Start the YTDL process in a separate process
+            # (a cache hit with an expired stream URL can skip the search and resolve the video directly)
+            lookup = cached['webpage_url'] if cached and cached['webpage_url'] else query
+            ytdl_processor.process_url(query_id, lookup, mode="stream")
+            
+            # Wait for result (non-blocking)
+            result, is_stream = await check_ytdl_result(ctx, query_id, status_message, query)
+            
+            if not result:
+                return  # Error message already shown by check_ytdl_result
+            
+            # Create StreamSong from the YTDL result
+            song = StreamSong.from_result(result, ctx.author)
+        else:
+            # Use regular Song class for local files
+            # (the index normally knows the duration, otherwise probe it off the loop)
+            duration = entry.duration or await duration_prober.get_duration(entry.path)
+            song = Song(entry.name, entry.path, ctx.author, duration=duration)
+
+        # Queue the song and start playback with the guild's lock held, so two -play
+        # commands arriving together can't both find the player idle and both start a song
+        async with guild_locks.hold(ctx.guild.id, reserved=True):
+            # Fetched only now, a player fetched before the search could have been evicted during it
+            player = get_player(ctx.guild.id)
+            if len(player.queue) >= MAX_QUEUE_LENGTH:
+                await ctx.send(f"❌ The queue is full ({MAX_QUEUE_LENGTH} songs). Remove some songs first.")
+                return
+
+            try:
+                if not await connect_voice(ctx, voice_channel):
+                    return
+
+                if not player.is_playing:
+                    # Nothing playing yet - queue the song and start it right away
+                    player.add_to_queue(song)
+                    await play_next(ctx, bot)
+                else:
+                    # Add to queue
+                    player.add_to_queue(song)
+                    ensure_lookahead(bot, player)
+                
+                    # Create "Added to Queue" embed
+                    embed = discord.Embed(
+                        title="📝 Added to Queue",
+                        description=f"**{song.name}**",
+                        color=0xFFD700  # Secondary color (gold) for queue messages
+                    )
+                    embed.add_field(
+                        name="Requested by",
+                        value=song.requester_name,
+                        inline=True
+                    )
+                    embed.add_field(
+                        name="Duration",
+                        value=song.formatted_duration,
+                        inline=True
+                    )
+                    embed.add_field(
+                        name="Position in queue",
+                        value=len(player.queue),
+                        inline=True
+                    )
+
+                    if hasattr(song, 'thumbnail'):
+                        embed.set_thumbnail(url=song.thumbnail)
+                    elif song.requester_avatar:
+                        embed.set_thumbnail(url=song.requester_avatar)
+                
+                    await ctx.send(embed=embed)
+            
+            except Exception as e:
+                await ctx.send(f"An error occurred: {str(e)}")
\ No newline at end of file
@@ -1,63 +1,125 @@
-import discord
-from discord.ext import commands
-from datetime import timedelta
-from libs.music.core import players
-
-def setup(bot):
-    """Setup the queue command"""
-    @bot.command(name='queue')
-    async def queue(ctx):
-        """Show the current queue"""
-        if ctx.guild.id not in players or not players[ctx.guild.id].queue:
-            await ctx.send("The queue is empty!")
-            return
-            
-        player = players[ctx.guild.id]
-        
-        embed = discord.Embed(
-            title="🎵 Queue",
-            color=0x89CFF0
-        )
-        
-        # Add current song
-        if player.current_song:
-            embed.add_field(
-                name="Now Playing",
-                value=f"**{player.current_song.name}** ({player.current_song.formatted_duration}) - Requested by {player.current_song.requester.display_name}",
-                inline=False
-            )
-        
-        # Add queue
-        queue_str = ""
-        total_duration = sum(song.duration for song in player.queue)
-        
-        for i, song in enumerate(player.queue, 1):
-            queue_str += f"{i}. **{song.name}** ({song.formatted_duration}) - Requested by {song.requester.display_name}\n"
-            if i >= 10:  # Only show first 10 songs
-                remaining = len(player.queue) - 10
-                if remaining > 0:
-                    queue_str += f"...and {remaining} more"
-                break
-        
-        if queue_str:
-            embed.add_field(
-                name="Up Next",
-                value=queue_str,
-                inline=False
-            )
-            
-            # Add total duration field
-            total_duration_formatted = str(timedelta(seconds=total_duration)).split(".")[0]  # Remove microseconds
-            embed.add_field(
-                name="Total Queue Duration",
-                value=total_duration_formatted,
-                inline=True
-            )
-            
-            embed.add_field(
-                name="Songs in Queue",
-                value=str(len(player.queue)),
-                inline=True
-            )
-            
-        await ctx.send(embed=embed)
\ No newline at end of file
+import discord
+from discord.ext import commands
+from datetime import timedelta
+from libs.music.core import players
+from libs.music.queue_pages import QueuePages
+
+def format_queue_line(position, song):
+    """One line of the Up Next listing"""
+    return f"{position}. **{song.name}** ({song.formatted_duration}) - Requested by {song.requester_name}"
+
+def get_queue_pages(player):
+    """Get the player's page cache, creating it the first time the queue is shown"""
+    if player.queue_pages is None:
+        player.queue_pages = QueuePages(player.queue, format_queue_line)
+    return player.queue_pages
+
+def build_queue_embed(player, page, viewer_id=None):
+    """Build the queue embed for one page of the queue"""
+    pages = get_queue_pages(player)
+    page = min(max(page, 0), pages.page_count() - 1)
+
+    embed = discord.Embed(
+        title="🎵 Queue",
+        color=0x89CFF0
+    )
+
+    # Current song and the page of the queue (cached until the queue changes there)
+    description = ""
+    if player.current_song:
+        description += f"▶️ **{player.current_song.name}** ({player.current_song.formatted_duration}) - Requested by {player.current_song.requester_name}\n\n"
+    page_text = pages.get(page)
+    description += f"**Up Next**\n{page_text}" if page_text else "The queue is empty!"
+    embed.description = description
+
+    if player.queue:
+        # Add total duration field
+        total_duration_formatted = str(timedelta(seconds=player.queue.total_duration)).split(".")[0]  # Remove microseconds
+        embed.add_field(
+            name="Total Queue Duration",
+            value=total_duration_formatted,
+            inline=True
+        )
+
+        embed.add_field(
+            name="Songs in Queue",
+            value=str(len(player.queue)),
+            inline=True
+        )
+
+    footer = f"Page {page + 1}/{pages.page_count()}"
+    your_songs = player.queue.requester_counts.get(viewer_id, 0)
+    if your_songs:
+        footer += f" • {your_songs} of these requested by you"
+    embed.set_footer(text=footer)
+    return embed
+
+class QueueView(discord.ui.View):
+    """Buttons for flipping through the pages of the queue"""
+
+    def __init__(self, player, viewer_id, timeout=120):
+        super().__init__(timeout=timeout)
+        self.player = player
+        self.viewer_id = viewer_id
+        self.page = 0
+        self.message = None
+        self.update_buttons()
+
+    def update_buttons(self):
+        """Disable the buttons that would leave the existing pages"""
+        last_page = get_queue_pages(self.player).page_count() - 1
+        self.page = min(self.page, last_page)
+        self.first_page.disabled = self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.last_page.disabled = self.page >= last_page
+
+    async def show(self, interaction):
+        self.update_buttons()
+        embed = build_queue_embed(self.player, self.page, self.viewer_id)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.secondary)
+    async def first_page(self, interaction, button):
+        self.page = 0
+        await self.show(interaction)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        self.page = max(self.page - 1, 0)
+        await self.show(interaction)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        self.page += 1
+        await self.show(interaction)
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
+    async def last_page(self, interaction, button):
+        self.page = get_queue_pages(self.player).page_count() - 1
+        await self.show(interaction)
+
+    async def on_timeout(self):
+        # Remove the buttons once nobody can use them anymore
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+def setup(bot):
+    """Setup the queue command"""
+    @bot.command(name='queue')
+    async def queue(ctx):
+        """Show the current queue"""
+        if ctx.guild.id not in players or not players[ctx.guild.id].queue:
+            await ctx.send("The queue is empty!")
+            return
+
+        player = players[ctx.guild.id]
+        embed = build_queue_embed(player, 0, ctx.author.id)
+
+        # Only long queues need the page buttons
+        if get_queue_pages(player).page_count() > 1:
+            view = QueueView(player, ctx.author.id)
+            view.message = await ctx.send(embed=embed, view=view)
+        else:
+            await ctx.send(embed=embed)
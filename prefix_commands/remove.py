@@ -1,65 +1,93 @@
-import discord
-from discord.ext import commands
-from libs.music.core import players
-
-def setup(bot):
-    """Setup the remove command"""
-    @bot.command(name='remove')
-    async def remove(ctx, position: int = None):
-        """Remove a song from the queue by its position"""
-        if ctx.guild.id not in players or not players[ctx.guild.id].queue:
-            await ctx.send("The queue is empty!")
-            return
-            
-        player = players[ctx.guild.id]
-        queue_length = len(player.queue)
-        
-        # If no position is provided, show error message
-        if position is None:
-            await ctx.send("Please specify a position in the queue to remove. Use `-queue` to see all positions.")
-            return
-        
-        # Check if position is valid
-        if position < 1 or position > queue_length:
-            await ctx.send(f"Invalid position! Please specify a number between 1 and {queue_length}.")
-            return
-        
-        # Get the song to be removed (convert position to 0-based index)
-        song = player.queue[position - 1]
-        
-        # Create embed before removing the song
-        embed = discord.Embed(
-            title="🗑️ Removed from Queue",
-            description=f"**{song.name}** ({song.formatted_duration}) - Requested by {song.requester.display_name}",
-            color=0x89CFF0
-        )
-        
-        # Remove the song
-        player.queue.remove(song)
-        
-        await ctx.send(embed=embed)
-    
-    @bot.command(name='rl')
-    async def remove_last(ctx):
-        """Remove the last song in the queue"""
-        if ctx.guild.id not in players or not players[ctx.guild.id].queue:
-            await ctx.send("The queue is empty!")
-            return
-            
-        player = players[ctx.guild.id]
-        queue_length = len(player.queue)
-        
-        # Get the last song
-        song = player.queue[queue_length - 1]
-        
-        # Create embed before removing the song
-        embed = discord.Embed(
-            title="🗑️ Removed Last Song",
-            description=f"**{song.name}** ({song.formatted_duration}) - Requested by {song.requester.display_name}",
-            color=0x89CFF0
-        )
-        
-        # Remove the last song
-        player.queue.pop()
-        
+import discord
+from discord.ext import commands
+from libs.music.core import players
+from libs.music.guild_lock import guild_locks
+
+def setup(bot):
+    """Setup the remove command"""
+    @bot.command(name='remove')
+    @guild_locks.serialized
+    async def remove(ctx, position: int = None):
+        """Remove a song from the queue by its position"""
+        if ctx.guild.id not in players or not players[ctx.guild.id].queue:
+            await ctx.send("The queue is empty!")
+            return
+            
+        player = players[ctx.guild.id]
+        queue_length = len(player.queue)
+        
+        # If no position is provided, show error message
+        if position is None:
+            await ctx.send("Please specify a position in the queue to remove. Use `-queue` to see all positions.")
+            return
+        
+        # Check if position is valid
+        if position < 1 or position > queue_length:
+            await ctx.send(f"Invalid position! Please specify a number between 1 and {queue_length}.")
+            return
+        
+        # Remove the song (convert position to 0-based index)
+        song = player.remove_song(position - 1)
+        
+        embed = discord.Embed(
+            title="🗑️ Removed from Queue",
+            description=f"**{song.name}** ({song.formatted_duration}) - Requested by {song.requester_name}",
+            color=0x89CFF0
+        )
+        
+        await ctx.send(embed=embed)
+
+    @bot.command(name='removerange')
+    @guild_locks.serialized
+    async def remove_range(ctx, start: int = None, end: int = None):
+        """Remove every song between two queue positions (inclusive)"""
+        if ctx.guild.id not in players or not players[ctx.guild.id].queue:
+            await ctx.send("The queue is empty!")
+            return
+
+        player = players[ctx.guild.id]
+        queue_length = len(player.queue)
+
+        if start is None or end is None:
+            await ctx.send("Please specify the first and last position to remove, e.g. `-removerange 3 10`.")
+            return
+
+        # Check if the range is valid
+        if start < 1 or end > queue_length or start > end:
+            await ctx.send(f"Invalid range! Positions must be between 1 and {queue_length}, first one first.")
+            return
+
+        # Remove the songs (convert to a 0-based, end exclusive range)
+        removed = player.remove_songs(start - 1, end)
+
+        embed = discord.Embed(
+            title="🗑️ Removed from Queue",
+            description=f"Removed **{len(removed)}** songs (positions {start}-{end})",
+            color=0x89CFF0
+        )
+        if len(removed) == 1:
+            song = removed[0]
+            embed.description = f"**{song.name}** ({song.formatted_duration}) - Requested by {song.requester_name}"
+
+        await ctx.send(embed=embed)
+    
+    @bot.command(name='rl')
+    @guild_locks.serialized
+    async def remove_last(ctx):
+        """Remove the last song in the queue"""
+        if ctx.guild.id not in players or not players[ctx.guild.id].queue:
+            await ctx.send("The queue is empty!")
+            return
+            
+        player = players[ctx.guild.id]
+        
+        # Remove the last song
+        song = player.remove_song(-1)
+        
+        embed = discord.Embed(
+            title="🗑️ Removed Last Song",
+            description=f"**{song.name}** ({song.formatted_duration}) - Requested by {song.requester_name}",
+            color=0x89CFF0
+        )
+        
         await ctx.send(embed=embed)
\ No newline at end of file
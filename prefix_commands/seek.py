@@ -0,0 +1,60 @@
+import discord
+from discord.ext import commands
+from libs.music.core import players
+from libs.music.guild_lock import guild_locks
+from prefix_commands.play import seek_current
+
+def parse_timestamp(text):
+    """
+    Parse a time like 90, 1:30 or 1:02:30 into seconds
+
+    Returns:
+        Seconds, None if the text isn't a time
+    """
+    parts = text.strip().split(':')
+    if len(parts) > 3 or not all(part.isdigit() for part in parts):
+        return None
+    seconds = 0
+    for part in parts:
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+def format_timestamp(seconds):
+    """Format seconds as mm:ss, or h:mm:ss past an hour"""
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+def setup(bot):
+    """Setup the seek command"""
+    @bot.command(name='seek')
+    @guild_locks.serialized
+    async def seek(ctx, timestamp: str = None):
+        """Jump to a position in the current song"""
+        player = players.get(ctx.guild.id)
+        if not ctx.voice_client or player is None or not player.current_song:
+            await ctx.send("Nothing is playing right now!")
+            return
+
+        position = parse_timestamp(timestamp) if timestamp else None
+        if position is None:
+            await ctx.send("Please specify where to jump to, e.g. `-seek 1:30`.")
+            return
+
+        song = player.current_song
+        if song.duration and position >= song.duration:
+            await ctx.send(f"❌ **{song.name}** is only {song.formatted_duration} long.")
+            return
+
+        if not await seek_current(ctx, bot, position):
+            await ctx.send(f"❌ Could not jump to {format_timestamp(position)} in **{song.name}**.")
+            return
+
+        embed = discord.Embed(
+            title="⏩ Seeked",
+            description=f"Jumped to {format_timestamp(position)} in **{song.name}**",
+            color=0x89CFF0
+        )
+        await ctx.send(embed=embed)
@@ -0,0 +1,24 @@
+import discord
+from discord.ext import commands
+from libs.music.core import players
+from libs.music.guild_lock import guild_locks
+
+def setup(bot):
+    """Setup the shuffle command"""
+    @bot.command(name='shuffle')
+    @guild_locks.serialized
+    async def shuffle(ctx):
+        """Shuffle the songs in the queue"""
+        if ctx.guild.id not in players or not players[ctx.guild.id].queue:
+            await ctx.send("The queue is empty!")
+            return
+
+        player = players[ctx.guild.id]
+        player.shuffle_queue()
+
+        embed = discord.Embed(
+            title="🔀 Shuffled",
+            description=f"Shuffled **{len(player.queue)}** songs in the queue",
+            color=0x89CFF0
+        )
+        await ctx.send(embed=embed)
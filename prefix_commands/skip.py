@@ -1,21 +1,23 @@
-import discord
-from discord.ext import commands
-from libs.music.core import players
-
-def setup(bot):
-    """Setup the skip command"""
-    @bot.command(name='skip')
-    async def skip(ctx):
-        """Skip the current song"""
-        if not ctx.voice_client or not players[ctx.guild.id].is_playing:
-            await ctx.send("Nothing is playing right now!")
-            return
-            
-        ctx.voice_client.stop()  # This will trigger the after callback and play next song
-        
-        embed = discord.Embed(
-            title="⏭️ Skipped",
-            description="Playing next song in queue...",
-            color=0x89CFF0
-        )
+import discord
+from discord.ext import commands
+from libs.music.core import players
+from libs.music.guild_lock import guild_locks
+
+def setup(bot):
+    """Setup the skip command"""
+    @bot.command(name='skip')
+    @guild_locks.serialized
+    async def skip(ctx):
+        """Skip the current song"""
+        if not ctx.voice_client or not players[ctx.guild.id].is_playing:
+            await ctx.send("Nothing is playing right now!")
+            return
+            
+        ctx.voice_client.stop()  # This will trigger the after callback and play next song
+        
+        embed = discord.Embed(
+            title="⏭️ Skipped",
+            description="Playing next song in queue...",
+            color=0x89CFF0
+        )
         await ctx.send(embed=embed)
\ No newline at end of file